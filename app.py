@@ -1,17 +1,75 @@
 import asyncio
 import logging
+from typing import Any, Callable, Dict
 from aiogram.types import BotCommand
 from bot import dp, bot
-from routers import commands_router, callbacks_router, messages_router
+from routers import commands_router, callbacks_router, messages_router, inline_router
+from middlewares import DuplicateSuppressionMiddleware, AdmissionControlMiddleware, ProfilingMiddleware
 from logger import get_logger
+from models import get_pool_metrics
+from services.inline_search_service import refresh_hot_index
+from services.media_cache import media_cache, image_cache
+from services.resilience import get_breaker_states
+from services.model_router import model_router
+from services.similarity_service import refresh_similarity_index
+from services.profiling_service import StackSampler, ProfileWriter, LoopLagMonitor
+from config import (
+    DB_POOL_METRICS_INTERVAL,
+    METRICS_INTERVAL,
+    INLINE_HOT_INDEX_REFRESH,
+    SIMILAR_REFRESH,
+    DUPLICATE_COOLDOWN,
+    ADMISSION_HEAVY_LIMIT,
+    ADMISSION_HEAVY_QUEUE,
+    ADMISSION_HEAVY_PER_USER,
+    ADMISSION_LISTING_LIMIT,
+    ADMISSION_LISTING_QUEUE,
+    ADMISSION_LISTING_PER_USER,
+    ADMISSION_QUEUE_TIMEOUT,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SLOW_THRESHOLD_MS,
+    PROFILE_SAMPLER_INTERVAL_MS,
+    PROFILE_DIR,
+    PROFILE_MAX_FILES,
+    LOOP_LAG_THRESHOLD_MS,
+)
 
 # Get logger
 logger = get_logger()
 
+# Register middlewares
+profiling = None
+if PROFILE_SAMPLE_RATE > 0 or PROFILE_SLOW_THRESHOLD_MS > 0:
+    # Outermost, so a slow update's time includes waiting in the other middlewares
+    stack_sampler = None
+    if PROFILE_SLOW_THRESHOLD_MS > 0:
+        stack_sampler = StackSampler(interval=PROFILE_SAMPLER_INTERVAL_MS / 1000)
+        stack_sampler.start()
+    profiling = ProfilingMiddleware(
+        writer=ProfileWriter(PROFILE_DIR, PROFILE_MAX_FILES),
+        sample_rate=PROFILE_SAMPLE_RATE,
+        slow_threshold=PROFILE_SLOW_THRESHOLD_MS / 1000 if PROFILE_SLOW_THRESHOLD_MS > 0 else None,
+        sampler=stack_sampler,
+    )
+    dp.update.outer_middleware(profiling)
+duplicate_suppression = DuplicateSuppressionMiddleware(cooldown=DUPLICATE_COOLDOWN)
+dp.message.outer_middleware(duplicate_suppression)
+dp.callback_query.outer_middleware(duplicate_suppression)
+admission_control = AdmissionControlMiddleware(
+    classes={
+        "heavy": (ADMISSION_HEAVY_LIMIT, ADMISSION_HEAVY_QUEUE, ADMISSION_HEAVY_PER_USER),
+        "listing": (ADMISSION_LISTING_LIMIT, ADMISSION_LISTING_QUEUE, ADMISSION_LISTING_PER_USER),
+    },
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+)
+dp.message.outer_middleware(admission_control)
+dp.callback_query.outer_middleware(admission_control)
+
 # Register routers
 dp.include_router(commands_router)
 dp.include_router(callbacks_router)
 dp.include_router(messages_router)
+dp.include_router(inline_router)
 
 async def set_commands():
     """Set bot commands in the menu"""
@@ -20,16 +78,73 @@ async def set_commands():
         BotCommand(command="help", description="Show help"),
         BotCommand(command="random", description="Suggest a random movie"),
         BotCommand(command="watchlist", description="Show my watchlist"),
+        BotCommand(command="movie", description="Show movie details"),
+        BotCommand(command="similar", description="Find movies like this one"),
     ]
     await bot.set_my_commands(commands)
 
+async def log_pool_metrics(interval: int):
+    """Periodically log DB pool metrics"""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(f"DB pool metrics: {get_pool_metrics()}")
+
+async def log_service_metrics(interval: int, sources: Dict[str, Callable[[], Any]]):
+    """Periodically log upstream breakers, model tiers, caches and middleware stats"""
+    while True:
+        await asyncio.sleep(interval)
+        for name, get_stats in sources.items():
+            logger.info(f"📊 {name}: {get_stats()}")
+
+async def refresh_inline_index(interval: int):
+    """Keep the inline search hot index in sync with the database"""
+    while True:
+        try:
+            await refresh_hot_index()
+        except Exception as e:
+            logger.error(f"Failed to refresh inline hot index: {e}", exc_info=True)
+        await asyncio.sleep(interval)
+
+async def refresh_similar_movies(interval: int):
+    """Fold newly added movies into the similar movies index"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_similarity_index()
+        except Exception as e:
+            logger.error(f"Failed to refresh similarity index: {e}", exc_info=True)
+
 async def main():
     """Main function"""
     logging.basicConfig(level=logging.INFO)
     logger.info("Starting bot...")
 
     try:
+        media_cache.reconcile()
+        image_cache.reconcile()
         await set_commands()
+        asyncio.create_task(refresh_inline_index(INLINE_HOT_INDEX_REFRESH))
+        loop_lag_monitor = None
+        if LOOP_LAG_THRESHOLD_MS > 0:
+            loop_lag_monitor = LoopLagMonitor(threshold=LOOP_LAG_THRESHOLD_MS / 1000)
+            asyncio.create_task(loop_lag_monitor.run())
+        if SIMILAR_REFRESH > 0:
+            asyncio.create_task(refresh_similar_movies(SIMILAR_REFRESH))
+        if DB_POOL_METRICS_INTERVAL > 0:
+            asyncio.create_task(log_pool_metrics(DB_POOL_METRICS_INTERVAL))
+        if METRICS_INTERVAL > 0:
+            sources = {
+                "Circuit breakers": get_breaker_states,
+                "Gemini model tiers": model_router.get_stats,
+                "Media cache": media_cache.get_stats,
+                "Image cache": image_cache.get_stats,
+                "Admission control": admission_control.get_stats,
+            }
+            if profiling:
+                sources["Profiling"] = profiling.get_stats
+            if loop_lag_monitor:
+                sources["Event loop"] = loop_lag_monitor.get_stats
+            asyncio.create_task(log_service_metrics(METRICS_INTERVAL, sources))
         logger.info("Bot is running...")
         await dp.start_polling(bot)
     except Exception as e:
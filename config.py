@@ -9,17 +9,46 @@ BOT_TOKEN = getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN not set in .env")
 
+# Telegram Bot API server
+TELEGRAM_API_URL = getenv("TELEGRAM_API_URL", "http://172.245.152.11:8081")
+# Set when the Bot API server runs with --local
+TELEGRAM_API_LOCAL = getenv("TELEGRAM_API_LOCAL", "false").lower() == "true"
+# How files are handed to the Bot API: "local" (file:// path on a shared volume) or "multipart"
+BOT_API_FILE_TRANSFER = getenv("BOT_API_FILE_TRANSFER", "local" if TELEGRAM_API_LOCAL else "multipart")
+if BOT_API_FILE_TRANSFER not in ("local", "multipart"):
+    raise ValueError("BOT_API_FILE_TRANSFER must be 'local' or 'multipart'")
+# Mount point of the shared volume on this host and inside the Bot API server (if they differ)
+BOT_API_LOCAL_ROOT = getenv("BOT_API_LOCAL_ROOT")
+BOT_API_SERVER_ROOT = getenv("BOT_API_SERVER_ROOT")
+
 # Error logging channel
 ERROR_CHANNEL_ID = getenv("ERROR_CHANNEL_ID")
 if not ERROR_CHANNEL_ID:
     raise ValueError("ERROR_CHANNEL_ID not set in .env")
 ERROR_CHANNEL_ID = int(ERROR_CHANNEL_ID)
 
+# Telegram user ids allowed to run admin commands (comma-separated)
+ADMIN_IDS = {int(i) for i in getenv("ADMIN_IDS", "").replace(" ", "").split(",") if i}
+
 # Database settings
 DATABASE_URL = getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL not set in .env")
 
+# Database connection pool settings
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Cache size for asyncpg prepared statements (set to 0 behind pgbouncer in transaction mode)
+DB_STATEMENT_CACHE_SIZE = int(getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_ECHO = getenv("DB_ECHO", "false").lower() == "true"
+# Interval in seconds for logging pool metrics, 0 disables it
+DB_POOL_METRICS_INTERVAL = int(getenv("DB_POOL_METRICS_INTERVAL", "0"))
+# Interval in seconds for logging circuit breaker, model tier, cache and middleware stats, 0 disables it
+METRICS_INTERVAL = int(getenv("METRICS_INTERVAL", "0"))
+
 # TMDB API Key
 TMDB_API_KEY = getenv("TMDB_API_KEY")
 if not TMDB_API_KEY:
@@ -36,7 +65,64 @@ GEMINI_API_KEY = getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not set in .env")
 
+# Gemini model tiers: captions start on a fast model and escalate only when needed
+GEMINI_CAPTION_MODEL = getenv("GEMINI_CAPTION_MODEL", "gemini-2.5-flash")
+GEMINI_ESCALATION_MODEL = getenv("GEMINI_ESCALATION_MODEL", "gemini-2.5-pro")
+GEMINI_VIDEO_MODEL = getenv("GEMINI_VIDEO_MODEL", "gemini-2.5-pro")
+
 # Instagram credentials
 FASTSAVER_API_TOKEN = getenv("FASTSAVER_API_TOKEN")
 if not FASTSAVER_API_TOKEN:
-    raise ValueError("FASTSAVER_API_TOKEN not set in .env")
\ No newline at end of file
+    raise ValueError("FASTSAVER_API_TOKEN not set in .env")
+
+# Inline mode settings
+INLINE_CACHE_TIME = int(getenv("INLINE_CACHE_TIME", "300"))
+INLINE_HOT_INDEX_SIZE = int(getenv("INLINE_HOT_INDEX_SIZE", "5000"))
+INLINE_HOT_INDEX_REFRESH = int(getenv("INLINE_HOT_INDEX_REFRESH", "900"))
+INLINE_TMDB_DEBOUNCE_MS = int(getenv("INLINE_TMDB_DEBOUNCE_MS", "400"))
+
+# Seconds during which a repeated heavy request from the same user is ignored
+DUPLICATE_COOLDOWN = float(getenv("DUPLICATE_COOLDOWN", "5"))
+
+# Admission control: concurrent handlers, queue length and per-user pending limit per handler class
+ADMISSION_HEAVY_LIMIT = int(getenv("ADMISSION_HEAVY_LIMIT", "4"))
+ADMISSION_HEAVY_QUEUE = int(getenv("ADMISSION_HEAVY_QUEUE", "20"))
+ADMISSION_HEAVY_PER_USER = int(getenv("ADMISSION_HEAVY_PER_USER", "2"))
+ADMISSION_LISTING_LIMIT = int(getenv("ADMISSION_LISTING_LIMIT", "8"))
+ADMISSION_LISTING_QUEUE = int(getenv("ADMISSION_LISTING_QUEUE", "50"))
+ADMISSION_LISTING_PER_USER = int(getenv("ADMISSION_LISTING_PER_USER", "1"))
+ADMISSION_QUEUE_TIMEOUT = float(getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+
+# On-disk cache for downloaded reels
+MEDIA_CACHE_DIR = getenv("MEDIA_CACHE_DIR", "downloads")
+MEDIA_CACHE_MAX_BYTES = int(getenv("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Separate budget for carousel photos, cached under MEDIA_CACHE_DIR/images
+IMAGE_CACHE_MAX_BYTES = int(getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Download budget for all items of one (carousel) post
+MEDIA_POST_MAX_BYTES = int(getenv("MEDIA_POST_MAX_BYTES", str(500 * 1024 * 1024)))
+
+# Speculative prefetch of media and TMDb details when an Instagram link arrives (opt-in)
+PREFETCH_ENABLED = getenv("PREFETCH_ENABLED", "false").lower() == "true"
+PREFETCH_TTL = float(getenv("PREFETCH_TTL", "120"))
+PREFETCH_MAX_CONCURRENT = int(getenv("PREFETCH_MAX_CONCURRENT", "3"))
+PREFETCH_MAX_BYTES = int(getenv("PREFETCH_MAX_BYTES", str(500 * 1024 * 1024)))
+
+# Where catalogue exports are written before being sent (should be on the shared volume in local mode)
+EXPORT_DIR = getenv("EXPORT_DIR", "exports")
+
+# Precomputed "more like this" index: neighbours stored per movie, rows scored per batch,
+# and how often (seconds) new movies are folded in by the bot; 0 (default) leaves refreshes
+# to `python import_tmdb.py similar`
+SIMILAR_TOP_K = int(getenv("SIMILAR_TOP_K", "20"))
+SIMILAR_BATCH_SIZE = int(getenv("SIMILAR_BATCH_SIZE", "128"))
+SIMILAR_REFRESH = int(getenv("SIMILAR_REFRESH", "0"))
+
+# Opt-in profiling: fraction of updates run under cProfile, latency (ms) above which an update
+# is dumped with its sampled stacks (0 disables), and where dumps go (newest PROFILE_MAX_FILES kept)
+PROFILE_SAMPLE_RATE = float(getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_THRESHOLD_MS = int(getenv("PROFILE_SLOW_THRESHOLD_MS", "0"))
+PROFILE_SAMPLER_INTERVAL_MS = int(getenv("PROFILE_SAMPLER_INTERVAL_MS", "10"))
+PROFILE_DIR = getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(getenv("PROFILE_MAX_FILES", "200"))
+# Log event-loop stalls longer than this many ms with the blocking stack (0 disables)
+LOOP_LAG_THRESHOLD_MS = int(getenv("LOOP_LAG_THRESHOLD_MS", "0"))
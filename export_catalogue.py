@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+import logging
+from services.export_service import export_catalogue, EXPORT_FORMATS, EXPORT_BATCH_SIZE
+from logger import get_logger
+
+logger = get_logger()
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Export the movie catalogue with genres, cast and crew.")
+    parser.add_argument("output", help="Output file path")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl")
+    parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    return parser.parse_args()
+
+
+async def main():
+    """Main function"""
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    await export_catalogue(args.output, fmt=args.format, compress=args.gzip, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+import logging
+from datetime import date
+from services.import_service import export_url, import_export_file, enrich_imported_movies
+from services.similarity_service import refresh_similarity_index
+from logger import get_logger
+
+logger = get_logger()
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Bulk import TMDb daily ID exports into the database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import a movie or person export file")
+    import_parser.add_argument("kind", choices=["movies", "people"])
+    import_parser.add_argument("--file", help="Local .json.gz export file (downloaded and streamed if omitted)")
+    import_parser.add_argument("--date", type=date.fromisoformat, help="Export date (YYYY-MM-DD), defaults to yesterday")
+    import_parser.add_argument("--min-popularity", type=float, default=0.0)
+    import_parser.add_argument("--enrich", action="store_true", help="Run the detail enrichment pass afterwards")
+    import_parser.add_argument("--concurrency", type=int, default=8)
+
+    enrich_parser = subparsers.add_parser("enrich", help="Fetch details, cast and crew for imported movies")
+    enrich_parser.add_argument("--limit", type=int)
+    enrich_parser.add_argument("--concurrency", type=int, default=8)
+
+    similar_parser = subparsers.add_parser("similar", help="Update the precomputed similar movies index")
+    similar_parser.add_argument("--full", action="store_true", help="Rebuild every movie instead of only new ones")
+
+    return parser.parse_args()
+
+
+async def main():
+    """Main function"""
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    if args.command == "import":
+        source = args.file or export_url(args.kind, args.date)
+        logger.info(f"Importing {args.kind} from {source}...")
+        await import_export_file(args.kind, source, min_popularity=args.min_popularity)
+        if args.enrich and args.kind == "movies":
+            await enrich_imported_movies(concurrency=args.concurrency)
+    elif args.command == "enrich":
+        await enrich_imported_movies(limit=args.limit, concurrency=args.concurrency)
+    elif args.command == "similar":
+        await refresh_similarity_index(full=args.full)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
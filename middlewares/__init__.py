@@ -0,0 +1,9 @@
+from .duplicate_suppression import DuplicateSuppressionMiddleware
+from .admission_control import AdmissionControlMiddleware
+from .profiling import ProfilingMiddleware
+
+__all__ = [
+    "DuplicateSuppressionMiddleware",
+    "AdmissionControlMiddleware",
+    "ProfilingMiddleware",
+]
@@ -0,0 +1,115 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from logger import get_logger
+from .duplicate_suppression import HEAVY_CALLBACK_PREFIXES
+
+logger = get_logger()
+
+BUSY_TEXT = "🚦 The bot is busy right now, please try again in a minute."
+
+# Commands that read a whole list and can be expensive for large watchlists
+LISTING_COMMANDS = ("/watchlist", "/export")
+
+
+class HandlerClass:
+    """Concurrency limit and bounded wait queue for one class of handlers."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, per_user: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+        self.user_pending: Dict[int, int] = {}
+
+
+class AdmissionControlMiddleware(BaseMiddleware):
+    """
+    Bounds how many heavy handlers run at once.
+    Heavy updates wait in a bounded queue per handler class with a per-user cap;
+    when either is full the user gets an immediate "busy" reply instead of waiting.
+    Light updates (/start, watchlist toggles, paging) bypass admission entirely.
+    """
+
+    def __init__(self, classes: Dict[str, Tuple[int, int, int]], queue_timeout: float = 30.0):
+        self.classes = {
+            name: HandlerClass(name, limit, max_queue, per_user)
+            for name, (limit, max_queue, per_user) in classes.items()
+        }
+        self.queue_timeout = queue_timeout
+
+    def _classify(self, event: TelegramObject) -> Optional[str]:
+        if isinstance(event, CallbackQuery):
+            if event.data and event.data.startswith(HEAVY_CALLBACK_PREFIXES):
+                return "heavy"
+            return None
+        if isinstance(event, Message) and event.text:
+            text = event.text.strip()
+            if text.startswith(LISTING_COMMANDS):
+                return "listing"
+            if not text.startswith("/"):
+                # Instagram links and title searches both call external APIs
+                return "heavy"
+        return None
+
+    async def _reject(self, event: TelegramObject):
+        if isinstance(event, CallbackQuery):
+            await event.answer(BUSY_TEXT, show_alert=True)
+        elif isinstance(event, Message):
+            await event.answer(BUSY_TEXT)
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns running/waiting/rejected counts per handler class."""
+        return {
+            name: {"running": c.running, "waiting": c.waiting, "rejected": c.rejected}
+            for name, c in self.classes.items()
+        }
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = self._classify(event)
+        handler_class = self.classes.get(name) if name else None
+        user = data.get("event_from_user")
+        if handler_class is None or user is None:
+            return await handler(event, data)
+
+        pending = handler_class.user_pending.get(user.id, 0)
+        if pending >= handler_class.per_user or handler_class.waiting >= handler_class.max_queue:
+            handler_class.rejected += 1
+            logger.warning(f"Shedding {name} update from user {user.id} (waiting={handler_class.waiting})")
+            await self._reject(event)
+            return None
+
+        handler_class.user_pending[user.id] = pending + 1
+        try:
+            handler_class.waiting += 1
+            try:
+                await asyncio.wait_for(handler_class.semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                handler_class.rejected += 1
+                await self._reject(event)
+                return None
+            finally:
+                handler_class.waiting -= 1
+
+            handler_class.running += 1
+            try:
+                return await handler(event, data)
+            finally:
+                handler_class.running -= 1
+                handler_class.semaphore.release()
+        finally:
+            remaining = handler_class.user_pending.get(user.id, 1) - 1
+            if remaining > 0:
+                handler_class.user_pending[user.id] = remaining
+            else:
+                handler_class.user_pending.pop(user.id, None)
@@ -0,0 +1,64 @@
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from logger import get_logger
+
+logger = get_logger()
+
+INSTAGRAM_POST_REGEX = r"(?:https?:\/\/)?(?:www\.)?instagram\.com\/(?:p|reel|tv)\/([a-zA-Z0-9_-]+)"
+
+# Callback prefixes that start expensive work and should not run twice per user
+HEAVY_CALLBACK_PREFIXES = ("video_analyze_", "download_video_", "add_to_db_")
+
+
+class DuplicateSuppressionMiddleware(BaseMiddleware):
+    """
+    Drops repeated taps and repeated Instagram links from the same user.
+    An update is suppressed while an identical one is still being handled,
+    and for `cooldown` seconds after it was first accepted.
+    """
+
+    def __init__(self, cooldown: float = 5.0):
+        self.cooldown = cooldown
+        self._seen: Dict[Tuple[int, str], float] = {}
+        self._running: set = set()
+
+    def _key(self, event: TelegramObject) -> Optional[Tuple[int, str]]:
+        if isinstance(event, CallbackQuery) and event.data and event.data.startswith(HEAVY_CALLBACK_PREFIXES):
+            return event.from_user.id, event.data
+        if isinstance(event, Message) and event.text and event.from_user:
+            match = re.search(INSTAGRAM_POST_REGEX, event.text)
+            if match:
+                return event.from_user.id, f"instagram_{match.group(1)}"
+        return None
+
+    def _prune(self, now: float):
+        if len(self._seen) > 10_000:
+            self._seen = {k: t for k, t in self._seen.items() if now - t < self.cooldown}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        key = self._key(event)
+        if key is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if key in self._running or now - self._seen.get(key, float("-inf")) < self.cooldown:
+            logger.info(f"Suppressed duplicate request {key[1]} from user {key[0]}")
+            if isinstance(event, CallbackQuery):
+                await event.answer("⏳ Already working on it, please wait...")
+            return None
+
+        self._prune(now)
+        self._seen[key] = now
+        self._running.add(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self._running.discard(key)
@@ -0,0 +1,86 @@
+import asyncio
+import cProfile
+import random
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from services.profiling_service import StackSampler, ProfileWriter
+from logger import get_logger
+
+logger = get_logger()
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """
+    Opt-in update profiler.
+    A `sample_rate` fraction of updates runs under cProfile (one at a time, since only one
+    profiler can be active per thread). Any update slower than `slow_threshold` seconds is
+    dumped with the stack samples taken while it ran. Both see concurrent updates too, so
+    read dumps of busy periods with that in mind.
+    """
+
+    def __init__(
+        self,
+        writer: ProfileWriter,
+        sample_rate: float = 0.0,
+        slow_threshold: Optional[float] = None,
+        sampler: Optional[StackSampler] = None,
+    ):
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.sampler = sampler
+        self._profiling = False
+        self._writes: Set[asyncio.Task] = set()
+        self.profiled = 0
+        self.slow = 0
+
+    def _label(self, event: TelegramObject) -> str:
+        if isinstance(event, Update):
+            return f"update{event.update_id}_{event.event_type}"
+        return type(event).__name__.lower()
+
+    async def _write(self, label: str, collapsed: Counter, profile: Optional[cProfile.Profile]):
+        try:
+            await asyncio.to_thread(self.writer.write, label, collapsed, profile)
+        except Exception as e:
+            logger.error(f"Failed to write profile {label}: {e}", exc_info=True)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        profile = None
+        if not self._profiling and random.random() < self.sample_rate:
+            self._profiling = True
+            profile = cProfile.Profile()
+            profile.enable()
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            end = time.perf_counter()
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+            elapsed = end - start
+            is_slow = self.slow_threshold is not None and elapsed >= self.slow_threshold
+            if profile is not None or is_slow:
+                label = self._label(event) + ("_slow" if is_slow else "")
+                collapsed = self.sampler.collapsed_between(start, end) if self.sampler else Counter()
+                if is_slow:
+                    self.slow += 1
+                    logger.warning(f"🐢 Slow update {label}: {elapsed * 1000:.0f} ms, profile saved")
+                else:
+                    self.profiled += 1
+                task = asyncio.create_task(self._write(label, collapsed, profile))
+                self._writes.add(task)
+                task.add_done_callback(self._writes.discard)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"profiled": self.profiled, "slow": self.slow}
@@ -0,0 +1,18 @@
+-- Explicit marker for movies whose details, cast and crew were fetched from TMDb.
+ALTER TABLE movies ADD COLUMN IF NOT EXISTS enriched_at TIMESTAMP;
+
+-- Movies that already have details or credits count as enriched.
+UPDATE movies SET enriched_at = CURRENT_TIMESTAMP
+WHERE enriched_at IS NULL
+  AND (overview IS NOT NULL OR EXISTS (SELECT 1 FROM movie_cast c WHERE c.movie_id = movies.id));
+
+-- Earlier enrichment runs could insert the same credits twice; keep one copy.
+DELETE FROM movie_cast a USING movie_cast b
+WHERE a.id > b.id AND a.movie_id = b.movie_id AND a.person_id = b.person_id
+  AND a.character_name IS NOT DISTINCT FROM b.character_name;
+DELETE FROM movie_crew a USING movie_crew b
+WHERE a.id > b.id AND a.movie_id = b.movie_id AND a.person_id = b.person_id
+  AND a.job IS NOT DISTINCT FROM b.job;
+
+CREATE INDEX IF NOT EXISTS ix_movies_not_enriched
+    ON movies (popularity DESC NULLS LAST) WHERE enriched_at IS NULL;
@@ -0,0 +1,12 @@
+-- Per-user watchlists, replacing the global movies.is_tracked flag.
+-- is_tracked carried no user, so existing flags are not migrated; the column is left in place.
+CREATE TABLE IF NOT EXISTS user_watchlist (
+    user_id BIGINT NOT NULL,
+    movie_id INTEGER NOT NULL REFERENCES movies (id) ON DELETE CASCADE,
+    added_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, movie_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_user_watchlist_user_added
+    ON user_watchlist (user_id, added_at DESC) INCLUDE (movie_id);
+CREATE INDEX IF NOT EXISTS ix_user_watchlist_movie ON user_watchlist (movie_id);
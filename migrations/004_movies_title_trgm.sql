@@ -0,0 +1,4 @@
+-- Trigram index behind inline typeahead (ILIKE prefix and % similarity on movies.title).
+-- Creating the extension needs a role allowed to do so (superuser, or database owner on PostgreSQL 13+).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_movies_title_trgm ON movies USING gin (title gin_trgm_ops);
@@ -0,0 +1,9 @@
+-- Cache of extracted title -> TMDb id mappings used by services/alias_service.py.
+-- alias is the normalized title with "|<year>" appended ("dark knight|2008"), or a bare trailing "|" when no year is known ("dark knight|").
+CREATE TABLE IF NOT EXISTS title_aliases (
+    alias TEXT PRIMARY KEY,
+    tmdb_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_title_aliases_tmdb_id ON title_aliases (tmdb_id);
@@ -0,0 +1,24 @@
+-- Precomputed "more like this" neighbours, maintained by services/similarity_service.py.
+CREATE TABLE IF NOT EXISTS movie_similarities (
+    movie_id INTEGER NOT NULL REFERENCES movies (id) ON DELETE CASCADE,
+    similar_movie_id INTEGER NOT NULL REFERENCES movies (id) ON DELETE CASCADE,
+    rank INTEGER NOT NULL,
+    score DOUBLE PRECISION NOT NULL,
+    computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (movie_id, similar_movie_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_movie_similarities_movie_rank
+    ON movie_similarities (movie_id, rank) INCLUDE (similar_movie_id);
+CREATE INDEX IF NOT EXISTS ix_movie_similarities_similar ON movie_similarities (similar_movie_id);
+
+-- One row per movie whose neighbours were computed, including movies with none, so the
+-- incremental refresh only picks up movies that are new or re-enriched since (movies.enriched_at).
+CREATE TABLE IF NOT EXISTS movie_similarity_state (
+    movie_id INTEGER PRIMARY KEY REFERENCES movies (id) ON DELETE CASCADE,
+    computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO movie_similarity_state (movie_id, computed_at)
+SELECT movie_id, MAX(computed_at) FROM movie_similarities GROUP BY movie_id
+ON CONFLICT (movie_id) DO NOTHING;
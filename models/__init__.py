@@ -1,9 +1,101 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
-from config import DATABASE_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_ECHO,
+)
+
+
+class PoolMetrics:
+    """Collects connection pool checkout counts and wait times."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that measures how long callers wait for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            # Only the pool's own checkout timeout; connect and auth errors say nothing about sizing
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+def create_engine(
+    url: str = DATABASE_URL,
+    pool_size: int = DB_POOL_SIZE,
+    max_overflow: int = DB_MAX_OVERFLOW,
+    pool_timeout: float = DB_POOL_TIMEOUT,
+    pool_recycle: int = DB_POOL_RECYCLE,
+    pool_pre_ping: bool = DB_POOL_PRE_PING,
+    statement_cache_size: int = DB_STATEMENT_CACHE_SIZE,
+    echo: bool = DB_ECHO,
+) -> AsyncEngine:
+    """Creates an async engine with pool sizing and asyncpg statement cache settings."""
+    new_engine = create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+        echo=echo,
+        connect_args={"prepared_statement_cache_size": statement_cache_size},
+    )
+
+    sync_pool = new_engine.sync_engine.pool
+
+    @event.listens_for(sync_pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        pool_metrics.connects += 1
+
+    @event.listens_for(sync_pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics.checkouts += 1
+
+    @event.listens_for(sync_pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        pool_metrics.checkins += 1
+
+    return new_engine
+
 
 # Create async engine
-engine = create_async_engine(DATABASE_URL)
+engine = create_engine()
 
 # Create async session factory
 async_session = sessionmaker(
@@ -13,7 +105,31 @@ async_session = sessionmaker(
 # Create declarative base
 Base = declarative_base()
 
-async def get_session() -> AsyncSession:
-    """Function to get a DB session"""
+
+@asynccontextmanager
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """Scoped DB session; rolls back on error and always closes."""
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+
+
+def get_pool_metrics() -> Dict[str, float]:
+    """Returns current pool state and accumulated checkout/wait metrics."""
+    pool = engine.sync_engine.pool
+    waits = pool_metrics.checkouts or 1
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin(),
+        "connects": pool_metrics.connects,
+        "checkouts": pool_metrics.checkouts,
+        "checkins": pool_metrics.checkins,
+        "timeouts": pool_metrics.timeouts,
+        "wait_avg_ms": pool_metrics.wait_total / waits * 1000,
+        "wait_max_ms": pool_metrics.wait_max * 1000,
+    }
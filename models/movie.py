@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, Date, Float, Boolean, TIMESTAMP
+from sqlalchemy import Column, Integer, Text, Date, Float, Boolean, TIMESTAMP, Index, func
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from . import Base
@@ -17,7 +17,17 @@ class Movie(Base):
     poster_url = Column(Text)
     is_tracked = Column(Boolean, default=False)
     created_at = Column(TIMESTAMP, server_default='CURRENT_TIMESTAMP')
+    updated_at = Column(TIMESTAMP, server_default='CURRENT_TIMESTAMP', onupdate=func.now())
+    # Set once details, cast and crew have been fetched from TMDb
+    enriched_at = Column(TIMESTAMP)
 
     # Relationships
     cast = relationship("MovieCast", back_populates="movie", cascade="all, delete-orphan")
     crew = relationship("MovieCrew", back_populates="movie", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Trigram index for typeahead (ILIKE prefix and % similarity); requires the pg_trgm extension
+        Index('ix_movies_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        # Work queue of the enrichment pass, most popular first
+        Index('ix_movies_not_enriched', popularity.desc().nulls_last(), postgresql_where=enriched_at.is_(None)),
+    )
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey, TIMESTAMP, Index
+from . import Base
+
+class MovieSimilarity(Base):
+    __tablename__ = 'movie_similarities'
+
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete="CASCADE"), primary_key=True)
+    similar_movie_id = Column(Integer, ForeignKey('movies.id', ondelete="CASCADE"), primary_key=True)
+    # 0 is the closest neighbour
+    rank = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    computed_at = Column(TIMESTAMP, server_default='CURRENT_TIMESTAMP', nullable=False)
+
+    __table_args__ = (
+        # Serves "more like this" in rank order from the index alone
+        Index('ix_movie_similarities_movie_rank', 'movie_id', 'rank', postgresql_include=['similar_movie_id']),
+        # Lets movie deletions cascade without a sequential scan
+        Index('ix_movie_similarities_similar', 'similar_movie_id'),
+    )
+
+
+class MovieSimilarityState(Base):
+    __tablename__ = 'movie_similarity_state'
+
+    # One row per movie whose neighbours were computed, including movies that have none,
+    # so the incremental refresh does not treat them as new on every run
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete="CASCADE"), primary_key=True)
+    computed_at = Column(TIMESTAMP, server_default='CURRENT_TIMESTAMP', nullable=False)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, Text, TIMESTAMP
+from . import Base
+
+class TitleAlias(Base):
+    __tablename__ = 'title_aliases'
+
+    # Normalized title, with "|<year>" appended when a year is known
+    alias = Column(Text, primary_key=True)
+    tmdb_id = Column(Integer, nullable=False, index=True)
+    created_at = Column(TIMESTAMP, server_default='CURRENT_TIMESTAMP')
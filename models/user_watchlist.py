@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, TIMESTAMP, Index
+from sqlalchemy.orm import relationship
+from . import Base
+
+class UserWatchlist(Base):
+    __tablename__ = 'user_watchlist'
+
+    user_id = Column(BigInteger, primary_key=True)
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete="CASCADE"), primary_key=True)
+    added_at = Column(TIMESTAMP, server_default='CURRENT_TIMESTAMP', nullable=False)
+
+    # Relationships
+    movie = relationship("Movie")
+
+    __table_args__ = (
+        # Covers "newest first" listings per user without touching the heap
+        Index('ix_user_watchlist_user_added', 'user_id', added_at.desc(), postgresql_include=['movie_id']),
+        # Lets movie deletions cascade without a sequential scan
+        Index('ix_user_watchlist_movie', 'movie_id'),
+    )
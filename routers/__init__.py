@@ -1,9 +1,11 @@
 from .commands import router as commands_router
 from .callbacks import router as callbacks_router
 from .messages import router as messages_router
+from .inline import router as inline_router
 
 __all__ = [
     "commands_router",
     "callbacks_router",
     "messages_router",
+    "inline_router",
 ]
@@ -1,11 +1,25 @@
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
-from sqlalchemy import select, update
+from typing import List
+from aiogram.types import (
+    CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, InputMediaPhoto, InputMediaVideo, Message,
+)
+from aiogram.exceptions import TelegramBadRequest
+from sqlalchemy import select
 from logger import get_logger
-from services.reel_service import download_instagram_video, extract_movie_titles_from_video
-from services.movie_service import search_movie_by_title, fetch_and_save_movie
+from services.reel_service import download_instagram_media, release_instagram_media, stream_movie_titles_from_video, MediaFile
+from services.movie_service import fetch_and_save_movie
+from services.alias_service import resolve_title, resolve_titles_in_background
+from services.progress_service import ProgressMessage
+from services.movie_details_service import get_credits_page
+from services.watchlist_service import add_to_watchlist, remove_from_watchlist, is_in_watchlist
+from services.render_service import render_movie_caption, movie_keyboard, watchlist_button, similar_movies_message, USER_CARD
+from services.similarity_service import get_similar_movies
+from services.poster_cache import get_poster, remember_poster
+from services.file_transfer import input_file, upload_limit, uses_local_transfer, multipart_upload_limit
 from models import get_session
 from models.movie import Movie
+from routers.commands import send_movie_details, SIMILAR_SHOW_LIMIT
+import html
 import os
 import uuid
 
@@ -15,20 +29,8 @@ logger = get_logger()
 # A temporary cache to store movie titles linked to a unique ID
 callback_movie_cache = {}
 
-def _format_movie_text_for_user(movie: Movie) -> str:
-    """Helper function to format movie info text for the user"""
-    text = f"🎬 <b>{movie.title}</b>\n\n"
-    if movie.release_date:
-        text += f"📅 <b>Release Date:</b> {movie.release_date.strftime('%Y-%m-%d')}\n"
-    if movie.vote_average:
-        text += f"⭐ <b>Rating:</b> {movie.vote_average}/10\n"
-    if movie.genres:
-        text += f"🎭 <b>Genres:</b> {', '.join(movie.genres)}\n"
-    if movie.overview:
-        overview = movie.overview[:300] + "..." if len(movie.overview) > 300 else movie.overview
-        text += f"\n📝 <b>Overview:</b>\n{overview}\n"
-    return text
-
+# Maximum number of items Telegram accepts in one sendMediaGroup call
+MEDIA_GROUP_SIZE = 10
 
 @router.callback_query(F.data.startswith("add_to_db_"))
 async def add_to_database_callback(callback: CallbackQuery):
@@ -46,52 +48,46 @@ async def add_to_database_callback(callback: CallbackQuery):
 
     await callback.answer(f"⏳ Processing {len(titles)} movie(s)...")
 
-    async for session in get_session():
+    async with get_session() as session:
         for title in titles:
             status_message = ""
             movie_to_show = None
 
             try:
-                search_result = await search_movie_by_title(title)
-                if not search_result:
+                tmdb_id = await resolve_title(title, session)
+                if tmdb_id is None:
                     await callback.message.answer(f"❌ Movie with title '{title}' not found.")
                     continue
 
-                tmdb_id = search_result.get("id")
-
                 result = await session.execute(select(Movie).where(Movie.tmdb_id == tmdb_id))
                 existing_movie = result.scalar_one_or_none()
 
                 if existing_movie:
-                    status_message = f"ℹ️ The movie '{existing_movie.title}' already exists in the database."
+                    status_message = f"ℹ️ The movie '{html.escape(existing_movie.title)}' already exists in the database."
                     movie_to_show = existing_movie
                 else:
                     new_movie = await fetch_and_save_movie(session, tmdb_id)
                     if new_movie:
-                        status_message = f"✅ The movie '{new_movie.title}' was successfully added to the database."
+                        status_message = f"✅ The movie '{html.escape(new_movie.title)}' was successfully added to the database."
                         movie_to_show = new_movie
                     else:
                         await callback.message.answer(f"❌ An error occurred while saving the movie '{title}'.")
                         continue
 
                 if movie_to_show:
-                    info_caption = _format_movie_text_for_user(movie_to_show)
-                    full_caption = f"{status_message}\n\n{info_caption}"
+                    full_caption = render_movie_caption(movie_to_show, USER_CARD, prefix=status_message)
 
-                    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(
-                            text="➕ Add to Watchlist",
-                            callback_data=f"watchlist_add_{movie_to_show.tmdb_id}"
-                        )]
-                    ])
+                    in_watchlist = await is_in_watchlist(session, callback.from_user.id, movie_to_show.tmdb_id)
+                    keyboard = movie_keyboard(movie_to_show.tmdb_id, USER_CARD, in_watchlist)
 
                     if movie_to_show.poster_url:
-                        await callback.message.answer_photo(
-                            photo=movie_to_show.poster_url,
+                        sent = await callback.message.answer_photo(
+                            photo=get_poster(movie_to_show),
                             caption=full_caption,
                             reply_markup=keyboard,
                             parse_mode="HTML"
                         )
+                        remember_poster(movie_to_show, sent)
                     else:
                         await callback.message.answer(
                             text=full_caption,
@@ -112,7 +108,14 @@ async def analyze_video_callback(callback: CallbackQuery):
     await callback.answer()
 
     try:
-        titles = await extract_movie_titles_from_video(shortcode)
+        progress = ProgressMessage(sent_m)
+        titles = []
+        async for title in stream_movie_titles_from_video(shortcode):
+            titles.append(title)
+            # Resolve early titles on TMDb while later ones are still being generated
+            resolve_titles_in_background([title])
+            found_movies_text = "\n".join(f"• {t}" for t in titles)
+            await progress.update(f"⏳ Analyzing video... Found so far:\n\n{found_movies_text}")
 
         if titles:
             found_movies_text = "\n".join(f"• {title}" for title in titles)
@@ -129,41 +132,74 @@ async def analyze_video_callback(callback: CallbackQuery):
                     )
                 ]
             ])
-            await sent_m.edit_text(response_text, reply_markup=keyboard)
+            await progress.update(response_text, reply_markup=keyboard, force=True)
         else:
-            await sent_m.edit_text("❌ Unfortunately, no movie was found in the video, or an error occurred during analysis.")
+            await progress.update("❌ Unfortunately, no movie was found in the video, or an error occurred during analysis.", force=True)
 
     except Exception as e:
         logger.error(f"Error in video analysis callback for {shortcode}: {e}", exc_info=True)
         await sent_m.edit_text("❌ An unexpected error occurred during the video analysis process.")
 
 
+def _input_media(media_file: MediaFile, caption: str | None, force_multipart: bool):
+    media = input_file(media_file.path, force_multipart)
+    if media_file.kind == "image":
+        return InputMediaPhoto(media=media, caption=caption)
+    return InputMediaVideo(media=media, caption=caption)
+
+
+async def _send_media_batch(message: Message, batch: List[MediaFile], caption: str | None, force_multipart: bool = False):
+    """Sends up to MEDIA_GROUP_SIZE files as one album, or as a single photo/video."""
+    if len(batch) > 1:
+        await message.answer_media_group(media=[
+            _input_media(f, caption if i == 0 else None, force_multipart) for i, f in enumerate(batch)
+        ])
+    elif batch[0].kind == "image":
+        await message.answer_photo(photo=input_file(batch[0].path, force_multipart), caption=caption)
+    else:
+        await message.answer_video(video=input_file(batch[0].path, force_multipart), caption=caption)
+
+
 @router.callback_query(F.data.startswith("download_video_"))
 async def download_video_callback(callback: CallbackQuery):
-    """Handles the download video button press using a shortcode."""
+    """Sends every video and photo of a post, in albums of up to ten."""
     shortcode = callback.data.replace("download_video_", "")
     sent_m = await callback.message.answer("⏳ Downloading video, please wait...")
+    files: List[MediaFile] = []
 
     try:
-        video_path = await download_instagram_video(shortcode)
-
-        if video_path and os.path.exists(video_path):
-            if os.path.getsize(video_path) > 50 * 1024 * 1024:
-                await sent_m.edit_text("❌ Video size is larger than 50 MB.")
-                return
-
-            video_file = FSInputFile(video_path)
-            await callback.message.answer_video(video=video_file, caption=f"Video from: `{shortcode}`")
-            await callback.message.delete()
-        else:
+        files = await download_instagram_media(shortcode)
+        if not files:
             await sent_m.edit_text("❌ Unfortunately, the video download failed.")
+            return
+
+        sizes = {f.path: os.path.getsize(f.path) for f in files}
+        sendable = [f for f in files if sizes[f.path] <= upload_limit()]
+        if not sendable:
+            await sent_m.edit_text(f"❌ Video size is larger than {upload_limit() // (1024 * 1024)} MB.")
+            return
+
+        caption = f"Video from: `{shortcode}`"
+        if len(sendable) < len(files):
+            caption += f"\n{len(files) - len(sendable)} item(s) larger than {upload_limit() // (1024 * 1024)} MB were skipped."
+        for start in range(0, len(sendable), MEDIA_GROUP_SIZE):
+            batch = sendable[start:start + MEDIA_GROUP_SIZE]
+            batch_caption = caption if start == 0 else None
+            try:
+                await _send_media_batch(callback.message, batch, batch_caption)
+            except TelegramBadRequest as e:
+                # The Bot API server may not see our volume; fall back to a regular upload if it fits
+                if not uses_local_transfer() or any(sizes[f.path] > multipart_upload_limit() for f in batch):
+                    raise
+                logger.warning(f"Local file transfer failed for {shortcode}: {e}. Falling back to multipart upload.")
+                await _send_media_batch(callback.message, batch, batch_caption, force_multipart=True)
+        await callback.message.delete()
 
     except Exception as e:
         logger.error(f"Error sending video {shortcode}: {e}", exc_info=True)
         await sent_m.edit_text("❌ An error occurred while sending the video.")
     finally:
-        if 'video_path' in locals() and video_path and os.path.exists(video_path):
-            os.remove(video_path)
+        release_instagram_media(files)
 
 
 @router.callback_query(F.data.startswith("watchlist_add_"))
@@ -171,22 +207,22 @@ async def add_to_watchlist_callback(callback: CallbackQuery):
     """Adds a movie to the user's watchlist."""
     try:
         tmdb_id = int(callback.data.replace("watchlist_add_", ""))
-        async for session in get_session():
-            await session.execute(
-                update(Movie).where(Movie.tmdb_id == tmdb_id).values(is_tracked=True)
-            )
-            await session.commit()
+        async with get_session() as session:
+            added = await add_to_watchlist(session, callback.from_user.id, tmdb_id)
+
+        if not added:
+            await callback.answer("❌ This movie is no longer in the database.", show_alert=True)
+            return
 
         await callback.answer("✅ Added to watchlist!", show_alert=True)
 
         if callback.message and callback.message.reply_markup:
-            updated_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(
-                    text="✅ In Watchlist",
-                    callback_data="already_in_watchlist"
-                )]
-            ])
-            await callback.message.edit_reply_markup(reply_markup=updated_keyboard)
+            # Only swap the watchlist button, keep any other buttons on the card
+            rows = [
+                [watchlist_button(tmdb_id, True) if button.callback_data == callback.data else button for button in row]
+                for row in callback.message.reply_markup.inline_keyboard
+            ]
+            await callback.message.edit_reply_markup(reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
 
     except Exception as e:
         logger.error(f"Error adding to watchlist: {e}", exc_info=True)
@@ -198,11 +234,8 @@ async def remove_from_watchlist_callback(callback: CallbackQuery):
     """Removes a movie from the user's watchlist."""
     try:
         tmdb_id = int(callback.data.replace("watchlist_remove_", ""))
-        async for session in get_session():
-            await session.execute(
-                update(Movie).where(Movie.tmdb_id == tmdb_id).values(is_tracked=False)
-            )
-            await session.commit()
+        async with get_session() as session:
+            await remove_from_watchlist(session, callback.from_user.id, tmdb_id)
 
         await callback.answer("🗑️ Removed from watchlist.", show_alert=True)
         await callback.message.delete()
@@ -212,6 +245,85 @@ async def remove_from_watchlist_callback(callback: CallbackQuery):
         await callback.answer("❌ An error occurred.", show_alert=True)
 
 
+def _credits_keyboard(tmdb_id: int, page: int, total_pages: int) -> InlineKeyboardMarkup | None:
+    """Builds the previous/next navigation for cast & crew pages."""
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(text="◀️ Previous", callback_data=f"credits_page_{tmdb_id}_{page - 1}"))
+    if page < total_pages - 1:
+        buttons.append(InlineKeyboardButton(text="Next ▶️", callback_data=f"credits_page_{tmdb_id}_{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+
+@router.callback_query(F.data.startswith("credits_page_"))
+async def credits_page_callback(callback: CallbackQuery):
+    """Switches the cast & crew message to another page."""
+    try:
+        tmdb_id, page = map(int, callback.data.replace("credits_page_", "").split("_"))
+        async with get_session() as session:
+            credits = await get_credits_page(session, tmdb_id, page)
+        if not credits:
+            await callback.answer("❌ This movie is no longer in the database.", show_alert=True)
+            return
+
+        text, page, total_pages = credits
+        await callback.message.edit_text(text, reply_markup=_credits_keyboard(tmdb_id, page, total_pages))
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error showing credits page: {e}", exc_info=True)
+        await callback.answer("❌ An error occurred.", show_alert=True)
+
+
+@router.callback_query(F.data.startswith("credits_"))
+async def credits_callback(callback: CallbackQuery):
+    """Sends the first page of a movie's cast & crew."""
+    try:
+        tmdb_id = int(callback.data.replace("credits_", ""))
+        async with get_session() as session:
+            credits = await get_credits_page(session, tmdb_id, 0)
+        if not credits:
+            await callback.answer("❌ This movie is no longer in the database.", show_alert=True)
+            return
+
+        text, page, total_pages = credits
+        await callback.message.answer(text, reply_markup=_credits_keyboard(tmdb_id, page, total_pages))
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error showing credits: {e}", exc_info=True)
+        await callback.answer("❌ An error occurred.", show_alert=True)
+
+
+@router.callback_query(F.data.startswith("similar_"))
+async def similar_callback(callback: CallbackQuery):
+    """Sends the precomputed "more like this" list for a movie."""
+    try:
+        tmdb_id = int(callback.data.replace("similar_", ""))
+        async with get_session() as session:
+            movies = await get_similar_movies(session, tmdb_id, SIMILAR_SHOW_LIMIT)
+        if not movies:
+            await callback.answer("No similar movies found yet.", show_alert=True)
+            return
+
+        text, keyboard = similar_movies_message(movies)
+        await callback.message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error showing similar movies: {e}", exc_info=True)
+        await callback.answer("❌ An error occurred.", show_alert=True)
+
+
+@router.callback_query(F.data.startswith("movie_card_"))
+async def movie_card_callback(callback: CallbackQuery):
+    """Opens the card of a movie picked from a list."""
+    try:
+        tmdb_id = int(callback.data.replace("movie_card_", ""))
+        await send_movie_details(callback.message, callback.from_user.id, tmdb_id)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error showing movie card: {e}", exc_info=True)
+        await callback.answer("❌ An error occurred.", show_alert=True)
+
+
 @router.callback_query(F.data == "already_in_watchlist")
 async def already_in_watchlist_callback(callback: CallbackQuery):
     """Handles clicks on buttons for movies already in the watchlist."""
@@ -1,28 +1,29 @@
 from aiogram import Router
-from aiogram.filters import Command
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from sqlalchemy import select
+from aiogram.filters import Command, CommandObject
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
 from models import get_session
-from models.movie import Movie
 from services.movie_service import get_random_movie
+from services.movie_details_service import get_movie_with_credits, format_credits_summary
+from services.watchlist_service import get_watchlist, is_in_watchlist
+from services.render_service import (
+    render_movie, render_movie_caption, movie_keyboard, similar_movies_message, telegram_length,
+    USER_CARD, WATCHLIST_ROW, CAPTION_LIMIT,
+)
+from services.similarity_service import get_similar_movies
+from services.poster_cache import get_poster, remember_poster
+from services.export_service import export_catalogue, EXPORT_FORMATS
+from services.file_transfer import input_file, uses_local_transfer, multipart_upload_limit
+from config import ADMIN_IDS, EXPORT_DIR
 from logger import get_logger
+from datetime import datetime
+import os
 
 router = Router(name="commands")
 logger = get_logger()
 
-def _format_movie_text_for_user(movie: Movie) -> str:
-    """Formats movie information for display to the user."""
-    text = f"🎬 <b>{movie.title}</b>\n\n"
-    if movie.release_date:
-        text += f"📅 <b>Release Date:</b> {movie.release_date.strftime('%Y-%m-%d')}\n"
-    if movie.vote_average:
-        text += f"⭐ <b>Rating:</b> {movie.vote_average}/10\n"
-    if movie.genres:
-        text += f"🎭 <b>Genres:</b> {', '.join(movie.genres)}\n"
-    if movie.overview:
-        overview = movie.overview[:300] + "..." if len(movie.overview) > 300 else movie.overview
-        text += f"\n📝 <b>Overview:</b>\n{overview}\n"
-    return text
+# Number of neighbours listed by /similar and "More like this"
+SIMILAR_SHOW_LIMIT = 10
 
 @router.message(Command("start"))
 async def cmd_start(message: Message):
@@ -37,6 +38,8 @@ async def cmd_help(message: Message):
         "/start - Start the bot\n"
         "/help - Show this help message\n"
         "/random - Get a random movie suggestion\n"
+        "/movie <tmdb id> - Show movie details with cast and crew\n"
+        "/similar <tmdb id> - Find movies like this one\n"
         "/watchlist - View your watchlist\n\n"
         "You can also send me a movie title or a link to an Instagram post!"
     )
@@ -45,34 +48,69 @@ async def cmd_help(message: Message):
 @router.message(Command("random"))
 async def cmd_random(message: Message):
     """Handles the /random command by suggesting a random movie."""
-    async for session in get_session():
+    async with get_session() as session:
         movie = await get_random_movie(session)
         if not movie:
             await message.answer("There are no movies in the database yet.")
             return
 
-        caption = _format_movie_text_for_user(movie)
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(
-                text="➕ Add to Watchlist",
-                callback_data=f"watchlist_add_{movie.tmdb_id}"
-            )]
-        ])
+        caption = render_movie(movie, USER_CARD)
+        in_watchlist = await is_in_watchlist(session, message.from_user.id, movie.tmdb_id)
+        keyboard = movie_keyboard(movie.tmdb_id, USER_CARD, in_watchlist)
 
         if movie.poster_url:
-            await message.answer_photo(photo=movie.poster_url, caption=caption, reply_markup=keyboard, parse_mode="HTML")
+            sent = await message.answer_photo(photo=get_poster(movie), caption=caption, reply_markup=keyboard, parse_mode="HTML")
+            remember_poster(movie, sent)
         else:
             await message.answer(text=caption, reply_markup=keyboard, parse_mode="HTML")
 
+async def send_movie_details(message: Message, user_id: int, tmdb_id: int):
+    """Sends a movie's card with director, top cast and the user's watchlist state."""
+    async with get_session() as session:
+        movie = await get_movie_with_credits(session, tmdb_id)
+        if not movie:
+            await message.answer("❌ This movie is not in the database.")
+            return
+
+        caption = render_movie_caption(movie, USER_CARD, suffix=format_credits_summary(movie))
+        in_watchlist = await is_in_watchlist(session, user_id, movie.tmdb_id)
+
+    keyboard = movie_keyboard(movie.tmdb_id, USER_CARD, in_watchlist, with_credits=True)
+
+    if movie.poster_url and telegram_length(caption) <= CAPTION_LIMIT:
+        sent = await message.answer_photo(photo=get_poster(movie), caption=caption, reply_markup=keyboard, parse_mode="HTML")
+        remember_poster(movie, sent)
+    else:
+        await message.answer(text=caption, reply_markup=keyboard, parse_mode="HTML")
+
+@router.message(Command("movie"))
+async def cmd_movie(message: Message, command: CommandObject):
+    """Shows the details of a movie, including director and top cast."""
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Usage: /movie <tmdb id>")
+        return
+    await send_movie_details(message, message.from_user.id, int(command.args.strip()))
+
+@router.message(Command("similar"))
+async def cmd_similar(message: Message, command: CommandObject):
+    """Lists movies similar to the given one from the precomputed index."""
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Usage: /similar <tmdb id>")
+        return
+    async with get_session() as session:
+        movies = await get_similar_movies(session, int(command.args.strip()), SIMILAR_SHOW_LIMIT)
+    if not movies:
+        await message.answer("No similar movies found yet.")
+        return
+    text, keyboard = similar_movies_message(movies)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
 @router.message(Command("watchlist"))
 async def cmd_watchlist(message: Message):
     """Displays the user's watchlist."""
     await message.answer("⏳ Fetching your watchlist...")
-    async for session in get_session():
-        result = await session.execute(
-            select(Movie).where(Movie.is_tracked == True).order_by(Movie.created_at.desc())
-        )
-        watchlist_movies = result.scalars().all()
+    async with get_session() as session:
+        watchlist_movies = await get_watchlist(session, message.from_user.id)
 
     if not watchlist_movies:
         await message.answer("Your watchlist is empty. You can add movies by searching for them or sending an Instagram link.")
@@ -80,14 +118,41 @@ async def cmd_watchlist(message: Message):
 
     await message.answer(f"You have {len(watchlist_movies)} movie(s) in your watchlist:")
     for movie in watchlist_movies:
-        caption = _format_movie_text_for_user(movie)
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(
-                text="🗑️ Remove from Watchlist",
-                callback_data=f"watchlist_remove_{movie.tmdb_id}"
-            )]
-        ])
+        caption = render_movie(movie, WATCHLIST_ROW)
+        keyboard = movie_keyboard(movie.tmdb_id, WATCHLIST_ROW)
         if movie.poster_url:
-            await message.answer_photo(photo=movie.poster_url, caption=caption, reply_markup=keyboard, parse_mode="HTML")
+            sent = await message.answer_photo(photo=get_poster(movie), caption=caption, reply_markup=keyboard, parse_mode="HTML")
+            remember_poster(movie, sent)
         else:
-            await message.answer(text=caption, reply_markup=keyboard, parse_mode="HTML")
\ No newline at end of file
+            await message.answer(text=caption, reply_markup=keyboard, parse_mode="HTML")
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject):
+    """Exports the catalogue as a gzipped CSV or JSON-lines file (admins only)."""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    fmt = (command.args or "jsonl").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        await message.answer(f"Usage: /export [{'|'.join(EXPORT_FORMATS)}]")
+        return
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"catalogue_{datetime.now():%Y%m%d_%H%M%S}.{fmt}.gz")
+    status = await message.answer("⏳ Exporting the catalogue...")
+    try:
+        count = await export_catalogue(path, fmt=fmt, compress=True)
+        caption = f"📦 {count} movies"
+        try:
+            await message.answer_document(document=input_file(path), caption=caption)
+        except TelegramBadRequest as e:
+            if not uses_local_transfer() or os.path.getsize(path) > multipart_upload_limit():
+                raise
+            logger.warning(f"Local file transfer failed for export: {e}. Falling back to multipart upload.")
+            await message.answer_document(document=input_file(path, force_multipart=True), caption=caption)
+        await status.delete()
+    except Exception as e:
+        logger.error(f"Error exporting catalogue: {e}", exc_info=True)
+        await status.edit_text("❌ The export failed.")
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
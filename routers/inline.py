@@ -0,0 +1,87 @@
+from datetime import datetime
+from aiogram import Router
+from aiogram.types import (
+    InlineQuery,
+    InlineQueryResultArticle,
+    InlineQueryResultCachedPhoto,
+    InlineQueryResultPhoto,
+    InputTextMessageContent,
+)
+from models.movie import Movie
+from services.inline_search_service import search_inline
+from services.poster_cache import get_poster_file_id
+from services.render_service import render_movie, movie_keyboard, USER_CARD
+from config import INLINE_CACHE_TIME
+from logger import get_logger
+
+router = Router(name="inline")
+logger = get_logger()
+
+
+def _thumbnail_url(poster_url: str) -> str:
+    """Uses a small TMDb rendition for thumbnails instead of the original image."""
+    return poster_url.replace("/t/p/original", "/t/p/w185")
+
+
+def _movie_from_tmdb(item: dict) -> Movie:
+    """Builds a transient Movie from a TMDb search result for rendering only."""
+    release_date = None
+    if item.get("release_date"):
+        try:
+            release_date = datetime.strptime(item["release_date"], "%Y-%m-%d").date()
+        except ValueError:
+            pass
+    return Movie(
+        tmdb_id=item["id"],
+        title=item.get("title") or item.get("original_title") or "",
+        overview=item.get("overview"),
+        release_date=release_date,
+        popularity=item.get("popularity"),
+        vote_average=item.get("vote_average"),
+        poster_url=None if not item.get("poster_path") else
+                   f"https://image.tmdb.org/t/p/original{item['poster_path']}",
+    )
+
+
+def _build_result(movie: Movie, in_database: bool):
+    """Builds the inline result for one movie, preferring an already uploaded poster."""
+    caption = render_movie(movie, USER_CARD)
+    keyboard = movie_keyboard(movie.tmdb_id, USER_CARD, with_similar=False) if in_database else None
+    result_id = f"movie_{movie.tmdb_id}"
+    description = str(movie.release_date.year) if movie.release_date else None
+
+    file_id = get_poster_file_id(movie.tmdb_id)
+    if file_id:
+        return InlineQueryResultCachedPhoto(
+            id=result_id, photo_file_id=file_id, title=movie.title, description=description,
+            caption=caption, parse_mode="HTML", reply_markup=keyboard,
+        )
+    if movie.poster_url:
+        return InlineQueryResultPhoto(
+            id=result_id, photo_url=movie.poster_url, thumbnail_url=_thumbnail_url(movie.poster_url),
+            title=movie.title, description=description,
+            caption=caption, parse_mode="HTML", reply_markup=keyboard,
+        )
+    return InlineQueryResultArticle(
+        id=result_id, title=movie.title, description=description,
+        input_message_content=InputTextMessageContent(message_text=caption, parse_mode="HTML"),
+        reply_markup=keyboard,
+    )
+
+
+@router.inline_query()
+async def handle_inline_query(inline_query: InlineQuery):
+    """Answers `@bot <title>` typeahead queries from the local catalogue, falling back to TMDb."""
+    try:
+        found = await search_inline(inline_query.from_user.id, inline_query.query)
+        if found is None:
+            # Superseded by a newer query from the same user
+            return
+        movies, tmdb_results = found
+
+        results = [_build_result(movie, True) for movie in movies]
+        results += [_build_result(_movie_from_tmdb(item), False) for item in tmdb_results]
+
+        await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False)
+    except Exception as e:
+        logger.error(f"Error answering inline query '{inline_query.query}': {e}", exc_info=True)
@@ -3,14 +3,17 @@ import uuid
 from aiogram import Router, F
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from services.movie_service import search_and_save_movies_from_titles
-from services.reel_service import get_post_caption, extract_movie_titles_from_caption
+from services.alias_service import resolve_titles_in_background
+from services.reel_service import get_post_caption, stream_movie_titles_from_caption
+from services.progress_service import ProgressMessage
+from services.prefetch_service import start_video_prefetch, prefetch_titles
 from logger import get_logger
+from middlewares.duplicate_suppression import INSTAGRAM_POST_REGEX
 from .callbacks import callback_movie_cache
 
 router = Router(name="messages")
 logger = get_logger()
 
-INSTAGRAM_POST_REGEX = r"(?:https?:\/\/)?(?:www\.)?instagram\.com\/(?:p|reel|tv)\/([a-zA-Z0-9_-]+)"
 
 @router.message(F.text)
 async def handle_text_message(message: Message):
@@ -35,7 +38,11 @@ async def handle_instagram_post_link(message: Message, match: re.Match):
     """Handles Instagram post links to extract movie titles."""
     shortcode = match.group(1)
 
-    await message.reply("Processing the link...")
+    # Opt-in: start the download before anyone presses a button
+    start_video_prefetch(shortcode)
+
+    status_message = await message.reply("Processing the link...")
+    progress = ProgressMessage(status_message)
     caption = await get_post_caption(shortcode)
     if not caption:
         response_text = 'no caption'
@@ -43,7 +50,16 @@ async def handle_instagram_post_link(message: Message, match: re.Match):
         # await message.reply("Error getting the caption.")
         # return
     else:
-        movie_titles = await extract_movie_titles_from_caption(caption)
+        movie_titles = []
+        async for title in stream_movie_titles_from_caption(caption):
+            movie_titles.append(title)
+            # Resolve early titles on TMDb while later ones are still being generated
+            resolve_titles_in_background([title])
+            found_movies_text = "\n".join(f"• {t}" for t in movie_titles)
+            await progress.update(f"⏳ Reading the caption... Found so far:\n\n{found_movies_text}")
+
+        prefetch_titles(shortcode, movie_titles)
+
         if not movie_titles:
             response_text = "No movie titles were found in the caption."
         else:
@@ -74,4 +90,4 @@ async def handle_instagram_post_link(message: Message, match: re.Match):
         ]
     ])
 
-    await message.answer(response_text, reply_markup=keyboard)
\ No newline at end of file
+    await progress.update(response_text, reply_markup=keyboard, force=True)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import asyncio
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from models import get_session
+from models.title_alias import TitleAlias
+from services.movie_service import search_movie_candidates
+from logger import get_logger
+
+logger = get_logger()
+
+# "(2008)", "[2008]", ", 2008" or "- 2008" at the end; a bare number may be part of the title ("Blade Runner 2049")
+_YEAR = re.compile(r"(?:[\(\[]\s*((?:18|19|20)\d{2})\s*[\)\]]|[,\-–]\s*((?:18|19|20)\d{2}))\s*$")
+_NON_WORD = re.compile(r"[^\w\s]")
+_LEADING_ARTICLE = re.compile(r"^(the|a|an)\s+")
+# Bullets and numbering models sometimes put in front of titles
+_LIST_PREFIX = re.compile(r"^\s*(?:[-*•]+|\d+[.)])\s*")
+
+# Strong references to lookups started by resolve_titles_in_background
+_background_lookups: set = set()
+
+
+def split_title(title: str) -> Tuple[str, Optional[int]]:
+    """Strips list markers and a trailing year: "1. The Dark Knight (2008)" -> ("The Dark Knight", 2008)."""
+    title = _LIST_PREFIX.sub("", title).strip()
+    year = None
+    match = _YEAR.search(title)
+    if match and match.start() > 0:
+        year = int(match.group(1) or match.group(2))
+        title = title[:match.start()].strip()
+    return title, year
+
+
+def normalize_title(title: str) -> str:
+    """Lowercases, strips accents, punctuation and a leading article."""
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(c for c in title if not unicodedata.combining(c))
+    title = _NON_WORD.sub(" ", title.lower())
+    title = " ".join(title.split())
+    return _LEADING_ARTICLE.sub("", title)
+
+
+def alias_key(title: str, year: Optional[int] = None) -> str:
+    return f"{normalize_title(title)}|{year or ''}"
+
+
+async def _lookup(session, keys: List[str]) -> Optional[int]:
+    result = await session.execute(select(TitleAlias.alias, TitleAlias.tmdb_id).where(TitleAlias.alias.in_(keys)))
+    found = dict(result.all())
+    for key in keys:
+        if key in found:
+            return found[key]
+    return None
+
+
+async def _lookup_isolated(session, keys: List[str]) -> Optional[int]:
+    """Looks keys up on the caller's session inside a savepoint, so a failure leaves its transaction usable."""
+    if session is None:
+        async with get_session() as own_session:
+            return await _lookup(own_session, keys)
+    async with session.begin_nested():
+        return await _lookup(session, keys)
+
+
+async def save_aliases(tmdb_id: int, keys: List[str]):
+    """Records confirmed alias -> tmdb_id mappings in its own session; existing mappings are kept."""
+    keys = [k for k in dict.fromkeys(keys) if not k.startswith("|")]
+    if not keys:
+        return
+    async with get_session() as session:
+        await session.execute(
+            insert(TitleAlias)
+            .values([{"alias": key, "tmdb_id": tmdb_id} for key in keys])
+            .on_conflict_do_nothing(index_elements=["alias"])
+        )
+        await session.commit()
+
+
+def _is_ambiguous(results: List[dict], title: str) -> bool:
+    """True when several TMDb results share the title, e.g. the 1984 and 2021 "Dune"."""
+    norm = normalize_title(title)
+    ids = {r["id"] for r in results if normalize_title(r.get("title") or "") == norm}
+    return len(ids) > 1
+
+
+async def _resolve(session, title: str) -> Optional[int]:
+    clean_title, year = split_title(title)
+    if not clean_title:
+        return None
+    key = alias_key(clean_title, year)
+
+    tmdb_id = await _lookup_isolated(session, [key])
+    if tmdb_id is not None:
+        return tmdb_id
+
+    results = await search_movie_candidates(clean_title, year=year)
+    if not results and year:
+        # The year may be wrong (e.g. a re-release); retry without it
+        results = await search_movie_candidates(clean_title)
+    if not results:
+        return None
+
+    result = results[0]
+    tmdb_id = result["id"]
+    canonical = result.get("title") or ""
+    release_year = int(result["release_date"][:4]) if result.get("release_date") else None
+    keys = []
+    if year:
+        keys.append(key)
+    if canonical:
+        # Maps the canonical TMDb title so other spellings that normalize to it resolve directly
+        keys.append(alias_key(canonical, release_year))
+    # A yearless alias is first-write-wins, so it is only kept when the title names a single movie;
+    # otherwise "dune" would stick to whichever remake was resolved first
+    if not year and not _is_ambiguous(results, clean_title):
+        keys.append(key)
+    if canonical and not _is_ambiguous(results, canonical):
+        keys.append(alias_key(canonical))
+    await save_aliases(tmdb_id, keys)
+    return tmdb_id
+
+
+async def resolve_title(title: str, session=None) -> Optional[int]:
+    """
+    Resolves an extracted title string to a TMDb id, via the alias table when possible
+    and TMDb search otherwise. Every successful search is recorded as an alias.
+    The caller's session is only read from, inside a savepoint; aliases are written in a separate session.
+    """
+    try:
+        return await _resolve(session, title)
+    except Exception as e:
+        logger.error(f"Error resolving title '{title}': {e}")
+        return None
+
+
+def resolve_titles_in_background(titles: List[str]):
+    """Starts resolving titles early so later calls hit the alias table or search cache."""
+    for title in titles:
+        task = asyncio.create_task(resolve_title(title))
+        _background_lookups.add(task)
+        task.add_done_callback(_background_lookups.discard)
@@ -0,0 +1,119 @@
+import csv
+import gzip
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, IO
+from sqlalchemy import text
+from models import engine
+from logger import get_logger
+
+logger = get_logger()
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+# Cast and crew are aggregated per movie in the database, so each output row is one movie
+EXPORT_QUERY = text("""
+    SELECT
+        m.tmdb_id,
+        m.title,
+        m.release_date,
+        m.popularity,
+        m.vote_average,
+        m.genres,
+        m.overview,
+        m.poster_url,
+        (
+            SELECT json_agg(json_build_object(
+                'tmdb_id', p.tmdb_id, 'name', p.name, 'character', mc.character_name, 'order', mc.cast_order
+            ) ORDER BY mc.cast_order NULLS LAST)
+            FROM movie_cast mc JOIN people p ON p.id = mc.person_id
+            WHERE mc.movie_id = m.id
+        ) AS cast,
+        (
+            SELECT json_agg(json_build_object(
+                'tmdb_id', p.tmdb_id, 'name', p.name, 'job', mw.job, 'department', mw.department
+            ) ORDER BY mw.department, mw.job)
+            FROM movie_crew mw JOIN people p ON p.id = mw.person_id
+            WHERE mw.movie_id = m.id
+        ) AS crew
+    FROM movies m
+    ORDER BY m.id
+""")
+
+CSV_COLUMNS = [
+    "tmdb_id", "title", "release_date", "popularity", "vote_average",
+    "genres", "overview", "poster_url", "cast", "crew",
+]
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+async def iter_catalogue(batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Dict]:
+    """Streams one dict per movie through a server-side cursor, `batch_size` rows at a time."""
+    async with engine.connect() as conn:
+        result = await conn.stream(EXPORT_QUERY.execution_options(yield_per=batch_size))
+        async for partition in result.mappings().partitions(batch_size):
+            for row in partition:
+                item = dict(row)
+                # asyncpg returns json_agg results as JSON text
+                for key in ("cast", "crew"):
+                    if isinstance(item[key], str):
+                        item[key] = json.loads(item[key])
+                    item[key] = item[key] or []
+                item["genres"] = item["genres"] or []
+                yield item
+
+
+def _write_csv_row(writer: csv.DictWriter, item: Dict):
+    writer.writerow({
+        **item,
+        "release_date": item["release_date"].isoformat() if item["release_date"] else "",
+        "genres": "; ".join(item["genres"]),
+        "cast": "; ".join(
+            f"{c['name']} ({c['character']})" if c.get("character") else c["name"] for c in item["cast"]
+        ),
+        "crew": "; ".join(f"{c['name']} ({c['job']})" for c in item["crew"]),
+    })
+
+
+def _open_output(path: str, compress: bool) -> IO[str]:
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+async def export_catalogue(path: str, fmt: str = "jsonl", compress: bool = False, batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """
+    Writes the whole catalogue (movies with genres, cast and crew) to `path` as CSV or JSON lines,
+    optionally gzip-compressed. Memory use does not depend on the table size.
+    Returns the number of movies written.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    count = 0
+    with _open_output(path, compress) as f:
+        writer = None
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+
+        async for item in iter_catalogue(batch_size):
+            if writer:
+                _write_csv_row(writer, item)
+            else:
+                f.write(json.dumps(item, ensure_ascii=False, default=_json_default))
+                f.write("\n")
+            count += 1
+            if count % (batch_size * 10) == 0:
+                logger.info(f"Exported {count} movies...")
+
+    logger.info(f"✅ Exported {count} movies to {path}")
+    return count
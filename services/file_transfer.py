@@ -0,0 +1,55 @@
+import os
+from pathlib import Path
+from typing import Union
+from aiogram.types import FSInputFile
+from config import BOT_API_FILE_TRANSFER, BOT_API_LOCAL_ROOT, BOT_API_SERVER_ROOT, TELEGRAM_API_LOCAL
+from logger import get_logger
+
+logger = get_logger()
+
+# Upload ceilings of the public Bot API and of a --local Bot API server (for any transfer mode)
+PUBLIC_UPLOAD_LIMIT = 50 * 1024 * 1024
+LOCAL_UPLOAD_LIMIT = 2000 * 1024 * 1024
+
+# Handing files over by path only works with a --local server; anything else would fail every send
+TRANSFER_MODE = BOT_API_FILE_TRANSFER
+if TRANSFER_MODE == "local" and not TELEGRAM_API_LOCAL:
+    logger.warning(
+        "BOT_API_FILE_TRANSFER=local requires a --local Bot API server (TELEGRAM_API_LOCAL=true); "
+        "falling back to multipart uploads"
+    )
+    TRANSFER_MODE = "multipart"
+
+
+def uses_local_transfer() -> bool:
+    """True when files are handed to a --local Bot API server by path instead of uploaded."""
+    return TRANSFER_MODE == "local"
+
+
+def upload_limit() -> int:
+    """Largest file the configured Bot API server accepts, by path or by multipart upload."""
+    return LOCAL_UPLOAD_LIMIT if TELEGRAM_API_LOCAL else PUBLIC_UPLOAD_LIMIT
+
+
+def multipart_upload_limit() -> int:
+    """Largest file the multipart fallback may upload; a --local server takes the same as by path."""
+    return upload_limit()
+
+
+def local_file_uri(path: str) -> str:
+    """
+    Maps a path on this host to a file:// URI as seen by the Bot API server.
+    BOT_API_LOCAL_ROOT/BOT_API_SERVER_ROOT translate between the two mounts of the shared volume.
+    """
+    absolute = Path(path).resolve()
+    if BOT_API_LOCAL_ROOT and BOT_API_SERVER_ROOT:
+        relative = os.path.relpath(absolute, Path(BOT_API_LOCAL_ROOT).resolve())
+        absolute = Path(BOT_API_SERVER_ROOT) / relative
+    return absolute.as_uri()
+
+
+def input_file(path: str, force_multipart: bool = False) -> Union[str, FSInputFile]:
+    """Returns what to pass to send_* methods: a file:// URI in local mode, otherwise a multipart upload."""
+    if uses_local_transfer() and not force_multipart:
+        return local_file_uri(path)
+    return FSInputFile(path)
@@ -0,0 +1,218 @@
+import asyncio
+import gzip
+import json
+import zlib
+from datetime import date, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+import aiohttp
+from sqlalchemy import select, text
+from models import get_session
+from models.movie import Movie
+from services.movie_service import enrich_movie
+from logger import get_logger
+
+logger = get_logger()
+
+# TMDb daily ID exports, see https://developer.themoviedb.org/docs/daily-id-exports
+EXPORT_BASE_URL = "http://files.tmdb.org/p/exports"
+EXPORT_FILES = {
+    "movies": "movie_ids",
+    "people": "person_ids",
+}
+
+# Number of rows sent to Postgres per COPY call
+COPY_BATCH_SIZE = 50_000
+
+# Staging tables live only for the duration of the import transaction
+STAGING_DDL = {
+    "movies": """
+        CREATE TEMP TABLE IF NOT EXISTS staging_movies (
+            tmdb_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            popularity DOUBLE PRECISION
+        ) ON COMMIT DROP
+    """,
+    "people": """
+        CREATE TEMP TABLE IF NOT EXISTS staging_people (
+            tmdb_id INTEGER NOT NULL,
+            name TEXT NOT NULL
+        ) ON COMMIT DROP
+    """,
+}
+
+# Set-based merge from staging into the real tables.
+# DISTINCT ON guards against duplicate ids inside one export file.
+MERGE_SQL = {
+    "movies": """
+        INSERT INTO movies (tmdb_id, title, popularity)
+        SELECT DISTINCT ON (tmdb_id) tmdb_id, title, popularity
+        FROM staging_movies
+        ORDER BY tmdb_id, popularity DESC NULLS LAST
+        ON CONFLICT (tmdb_id) DO UPDATE SET popularity = EXCLUDED.popularity, updated_at = CURRENT_TIMESTAMP
+    """,
+    "people": """
+        INSERT INTO people (tmdb_id, name)
+        SELECT DISTINCT ON (tmdb_id) tmdb_id, name
+        FROM staging_people
+        ORDER BY tmdb_id
+        ON CONFLICT (tmdb_id) DO NOTHING
+    """,
+}
+
+STAGING_COLUMNS = {
+    "movies": ("tmdb_id", "title", "popularity"),
+    "people": ("tmdb_id", "name"),
+}
+
+
+def export_url(kind: str, export_date: Optional[date] = None) -> str:
+    """Builds the URL of a TMDb daily export file. Defaults to yesterday's file."""
+    export_date = export_date or (date.today() - timedelta(days=1))
+    return f"{EXPORT_BASE_URL}/{EXPORT_FILES[kind]}_{export_date.strftime('%m_%d_%Y')}.json.gz"
+
+
+async def _iter_lines_from_url(url: str) -> AsyncIterator[bytes]:
+    """Streams a gzip file over HTTP and yields decompressed lines without buffering the whole file."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    pending = b""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                pending += decompressor.decompress(chunk)
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    yield line
+    pending += decompressor.flush()
+    if pending:
+        yield pending
+
+
+async def _iter_lines_from_file(path: str) -> AsyncIterator[bytes]:
+    """Yields lines from a local gzip export file."""
+    with gzip.open(path, "rb") as f:
+        for i, line in enumerate(f):
+            yield line
+            if i % 10_000 == 0:
+                # Give other tasks a chance to run during long imports
+                await asyncio.sleep(0)
+
+
+async def iter_export_rows(kind: str, source: str, min_popularity: float = 0.0) -> AsyncIterator[tuple]:
+    """
+    Yields staging rows from an export file (local path or URL),
+    skipping adult titles and anything below the popularity threshold.
+    """
+    if source.startswith(("http://", "https://")):
+        lines = _iter_lines_from_url(source)
+    else:
+        lines = _iter_lines_from_file(source)
+
+    async for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping malformed export line: {line[:100]!r}")
+            continue
+
+        if item.get("adult") or item.get("video"):
+            continue
+        popularity = item.get("popularity") or 0.0
+        if popularity < min_popularity:
+            continue
+
+        if kind == "movies":
+            title = item.get("original_title")
+            if title:
+                yield (item["id"], title, popularity)
+        else:
+            name = item.get("name")
+            if name:
+                yield (item["id"], name)
+
+
+async def _copy_batch(raw_connection, kind: str, rows: List[tuple]):
+    """Loads one batch of rows into the staging table with asyncpg COPY."""
+    await raw_connection.copy_records_to_table(
+        f"staging_{kind}", records=rows, columns=STAGING_COLUMNS[kind]
+    )
+
+
+async def import_export_file(kind: str, source: str, min_popularity: float = 0.0) -> Dict[str, int]:
+    """
+    Streams a TMDb export file into a staging table via COPY and merges it
+    into `movies` or `people` with a single set-based statement.
+    """
+    if kind not in EXPORT_FILES:
+        raise ValueError(f"Unknown export kind: {kind}")
+
+    staged = 0
+    async with get_session() as session:
+        connection = await session.connection()
+        await connection.execute(text(STAGING_DDL[kind]))
+
+        raw = await connection.get_raw_connection()
+        asyncpg_connection = raw.driver_connection
+
+        batch = []
+        async for row in iter_export_rows(kind, source, min_popularity):
+            batch.append(row)
+            if len(batch) >= COPY_BATCH_SIZE:
+                await _copy_batch(asyncpg_connection, kind, batch)
+                staged += len(batch)
+                logger.info(f"Staged {staged} {kind} rows...")
+                batch = []
+        if batch:
+            await _copy_batch(asyncpg_connection, kind, batch)
+            staged += len(batch)
+
+        result = await connection.execute(text(MERGE_SQL[kind]))
+        merged = result.rowcount
+        await session.commit()
+
+    logger.info(f"✅ Import of {kind} finished: {staged} staged, {merged} merged")
+    return {"staged": staged, "merged": merged}
+
+
+async def enrich_imported_movies(limit: Optional[int] = None, concurrency: int = 8) -> Dict[str, int]:
+    """
+    Fetches details, cast and crew for imported movies that were never enriched
+    (enriched_at is NULL), most popular first, with a bounded number of concurrent TMDb requests.
+    Credits are replaced rather than appended, so re-running is safe.
+    """
+    async with get_session() as session:
+        query = (
+            select(Movie.id)
+            .where(Movie.enriched_at.is_(None))
+            .order_by(Movie.popularity.desc().nulls_last())
+        )
+        if limit:
+            query = query.limit(limit)
+        result = await session.execute(query)
+        movie_ids = result.scalars().all()
+
+    pending = iter(movie_ids)
+    counts = {"enriched": 0, "failed": 0}
+
+    async def _worker():
+        # Workers share one iterator, so at most `concurrency` movies are in flight
+        for movie_id in pending:
+            async with get_session() as session:
+                movie = await session.get(Movie, movie_id)
+                if not movie:
+                    continue
+                tmdb_id = movie.tmdb_id
+                try:
+                    await enrich_movie(session, movie)
+                    counts["enriched"] += 1
+                except Exception as e:
+                    await session.rollback()
+                    counts["failed"] += 1
+                    logger.warning(f"Failed to enrich movie {tmdb_id}: {e}")
+
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    logger.info(f"Enrichment finished: {counts['enriched']} enriched, {counts['failed']} failed")
+    return counts
@@ -0,0 +1,145 @@
+import asyncio
+import re
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, or_, func
+from models import get_session
+from models.movie import Movie
+from services.movie_service import search_movies
+from config import INLINE_HOT_INDEX_SIZE, INLINE_TMDB_DEBOUNCE_MS
+from logger import get_logger
+
+logger = get_logger()
+
+# Number of results returned to Telegram per inline query
+INLINE_RESULT_LIMIT = 20
+# Minimum query length before falling back to TMDb
+TMDB_MIN_QUERY_LENGTH = 3
+# Maximum number of distinct queries kept in the result cache
+QUERY_CACHE_SIZE = 2048
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercases and strips punctuation so lookups are insensitive to both."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+class HotIndex:
+    """
+    In-memory prefix index over the most popular movies.
+    Every word boundary of a title is indexed, so "knight" finds "The Dark Knight".
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._movies: List[Movie] = []
+        self.loaded_at: Optional[datetime] = None
+
+    def build(self, movies: List[Movie]):
+        entries = []
+        for movie in movies:
+            words = normalize_query(movie.title).split()
+            for i in range(len(words)):
+                entries.append((" ".join(words[i:]), movie))
+        entries.sort(key=lambda e: e[0])
+        self._keys = [key for key, _ in entries]
+        self._movies = [movie for _, movie in entries]
+        self.loaded_at = datetime.now()
+
+    def search(self, query: str, limit: int = INLINE_RESULT_LIMIT) -> List[Movie]:
+        if not query:
+            return []
+        found: Dict[int, Movie] = {}
+        i = bisect_left(self._keys, query)
+        while i < len(self._keys) and self._keys[i].startswith(query):
+            movie = self._movies[i]
+            found[movie.tmdb_id] = movie
+            i += 1
+        return sorted(found.values(), key=lambda m: m.popularity or 0, reverse=True)[:limit]
+
+
+hot_index = HotIndex()
+
+# normalized query -> (local movies, TMDb results)
+_query_cache: "OrderedDict[str, Tuple[List[Movie], List[dict]]]" = OrderedDict()
+# user id -> sequence number of their latest inline query, used for debouncing
+_latest_query: Dict[int, int] = {}
+
+
+async def refresh_hot_index(size: int = INLINE_HOT_INDEX_SIZE):
+    """Reloads the hot index with the most popular movies from the database."""
+    async with get_session() as session:
+        result = await session.execute(
+            select(Movie).order_by(Movie.popularity.desc().nulls_last()).limit(size)
+        )
+        movies = result.scalars().all()
+    hot_index.build(movies)
+    _query_cache.clear()
+    logger.info(f"Inline hot index loaded with {len(movies)} movies")
+
+
+async def _search_database(query: str, limit: int) -> List[Movie]:
+    """Prefix and trigram search against the movies table (served by ix_movies_title_trgm)."""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    async with get_session() as session:
+        result = await session.execute(
+            select(Movie)
+            .where(or_(Movie.title.ilike(f"{escaped}%"), Movie.title.bool_op("%")(query)))
+            .order_by(func.similarity(Movie.title, query).desc(), Movie.popularity.desc().nulls_last())
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+
+def _cache_put(key: str, value: Tuple[List[Movie], List[dict]]):
+    _query_cache[key] = value
+    _query_cache.move_to_end(key)
+    while len(_query_cache) > QUERY_CACHE_SIZE:
+        _query_cache.popitem(last=False)
+
+
+async def search_inline(user_id: int, text: str, limit: int = INLINE_RESULT_LIMIT) -> Optional[Tuple[List[Movie], List[dict]]]:
+    """
+    Returns (local movies, TMDb results) for an inline query.
+    Returns None when the query was superseded by a newer one from the same user
+    while waiting out the TMDb debounce, in which case nothing should be answered.
+    """
+    query = normalize_query(text)
+    if not query:
+        return [], []
+
+    cached = _query_cache.get(query)
+    if cached is not None:
+        _query_cache.move_to_end(query)
+        return cached
+
+    movies = hot_index.search(query, limit)
+    if len(movies) < limit:
+        seen = {m.tmdb_id for m in movies}
+        for movie in await _search_database(query, limit):
+            if movie.tmdb_id not in seen and len(movies) < limit:
+                movies.append(movie)
+                seen.add(movie.tmdb_id)
+
+    tmdb_results: List[dict] = []
+    if len(movies) < limit and len(query) >= TMDB_MIN_QUERY_LENGTH:
+        sequence = _latest_query.get(user_id, 0) + 1
+        _latest_query[user_id] = sequence
+        await asyncio.sleep(INLINE_TMDB_DEBOUNCE_MS / 1000)
+        if _latest_query.get(user_id) != sequence:
+            return None
+        _latest_query.pop(user_id, None)
+
+        known = {m.tmdb_id for m in movies}
+        tmdb_results = [
+            r for r in await search_movies(query, limit - len(movies))
+            if r.get("id") not in known
+        ]
+
+    _cache_put(query, (movies, tmdb_results))
+    return movies, tmdb_results
+
@@ -0,0 +1,198 @@
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+from services.single_flight import single_flight
+from config import MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES, IMAGE_CACHE_MAX_BYTES
+from logger import get_logger
+
+logger = get_logger()
+
+# Suffix of files that are still being written
+PARTIAL_SUFFIX = ".part"
+
+
+class CacheEntry:
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.size = size
+        self.refs = 0
+
+
+class _Claim:
+    """One acquire() call waiting on a shared fetch; `held` once its reference was taken."""
+
+    def __init__(self):
+        self.held = False
+
+
+class MediaCache:
+    """
+    On-disk media cache with a total byte budget.
+    Files are named by the SHA-256 of their cache key, evicted in LRU order,
+    and never evicted while a caller holds a reference to them.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ".mp4"):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # digest -> acquire() calls waiting on the in-flight fetch
+        self._claims: Dict[str, List[_Claim]] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _digest(self, key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / f"{digest}{self.suffix}"
+
+    async def acquire(self, key: str, fetch: Callable[[Path], Awaitable[bool]]) -> Optional[Path]:
+        """
+        Returns the cached file for `key`, downloading it with `fetch(path)` on a miss.
+        Concurrent misses for the same key share one fetch. Every non-None result
+        must be paired with release(key).
+        """
+        digest = self._digest(key)
+        entry = self._entries.get(digest)
+        if entry and entry.path.exists():
+            entry.refs += 1
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry.path
+        if entry:
+            # File vanished from disk behind our back
+            del self._entries[digest]
+            self.total_bytes -= entry.size
+
+        self.misses += 1
+        claim = _Claim()
+        self._claims.setdefault(digest, []).append(claim)
+        try:
+            path = await single_flight.run(("media_cache", digest), lambda: self._fetch(digest, fetch))
+        except BaseException:
+            if claim.held:
+                # The fetch finished and counted us, but we are not going to use the file
+                self.release(key)
+            raise
+        finally:
+            claims = self._claims.get(digest)
+            if claims and claim in claims:
+                claims.remove(claim)
+                if not claims:
+                    del self._claims[digest]
+
+        if path is None or not claim.held:
+            return None
+        self._entries.move_to_end(digest)
+        self._evict()
+        return path
+
+    async def _fetch(self, digest: str, fetch: Callable[[Path], Awaitable[bool]]) -> Optional[Path]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(digest)
+        partial = path.with_name(path.name + PARTIAL_SUFFIX)
+        try:
+            if not await fetch(partial) or not partial.exists():
+                return None
+            os.replace(partial, path)
+        finally:
+            if partial.exists():
+                partial.unlink()
+
+        size = path.stat().st_size
+        entry = CacheEntry(path, size)
+        # Take every waiter's reference in the same step the entry appears,
+        # so no eviction can run between the fetch finishing and the waiters resuming
+        for claim in self._claims.pop(digest, []):
+            claim.held = True
+            entry.refs += 1
+        self._entries[digest] = entry
+        self.total_bytes += size
+        return path
+
+    def release(self, key: str):
+        """Drops one reference to a cached file, making it evictable again."""
+        entry = self._entries.get(self._digest(key))
+        if entry and entry.refs > 0:
+            entry.refs -= 1
+        self._evict()
+
+    def _evict(self):
+        """Evicts least recently used, unreferenced files until the cache fits its budget."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for digest in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            entry = self._entries[digest]
+            if entry.refs > 0:
+                continue
+            del self._entries[digest]
+            self.total_bytes -= entry.size
+            try:
+                entry.path.unlink()
+            except FileNotFoundError:
+                pass
+            logger.info(f"Evicted {entry.path.name} from media cache ({entry.size} bytes)")
+
+    def _is_cache_name(self, name: str) -> bool:
+        digest = name[:-len(self.suffix)] if name.endswith(self.suffix) else ""
+        return len(digest) == 64 and all(c in "0123456789abcdef" for c in digest)
+
+    def reconcile(self):
+        """
+        Rebuilds the index from disk at startup: adopts cache files (oldest first) and
+        deletes partial downloads. Files that do not follow the cache naming scheme are
+        left alone, since the directory is configurable and may be shared.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries.clear()
+        self.total_bytes = 0
+        removed = 0
+        foreign = 0
+
+        files = []
+        for path in self.directory.iterdir():
+            if not path.is_file():
+                continue
+            name = path.name
+            if self._is_cache_name(name):
+                files.append((path.stat().st_mtime, name[:-len(self.suffix)], path))
+            elif name.endswith(PARTIAL_SUFFIX) and self._is_cache_name(name[:-len(PARTIAL_SUFFIX)]):
+                path.unlink()
+                removed += 1
+            else:
+                foreign += 1
+
+        for _, digest, path in sorted(files):
+            size = path.stat().st_size
+            self._entries[digest] = CacheEntry(path, size)
+            self.total_bytes += size
+
+        self._evict()
+        logger.info(
+            f"Media cache reconciled: {len(self._entries)} files, "
+            f"{self.total_bytes} bytes, {removed} partial downloads removed"
+        )
+        if foreign:
+            logger.warning(f"{self.directory} holds {foreign} file(s) that are not cache entries; leaving them alone")
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "files": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "in_use": sum(1 for e in self._entries.values() if e.refs > 0),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+media_cache = MediaCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES)
+# Carousel photos live in a subdirectory so each cache's reconcile() leaves the other's files alone
+image_cache = MediaCache(os.path.join(MEDIA_CACHE_DIR, "images"), IMAGE_CACHE_MAX_BYTES, suffix=".jpg")
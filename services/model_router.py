@@ -0,0 +1,141 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+import google.generativeai as genai
+from services.resilience import ENDPOINTS, call_with_resilience, get_breaker, is_retryable
+from config import GEMINI_API_KEY, GEMINI_CAPTION_MODEL, GEMINI_ESCALATION_MODEL, GEMINI_VIDEO_MODEL
+from logger import get_logger
+
+logger = get_logger()
+
+# Configure Generative AI
+genai.configure(api_key=GEMINI_API_KEY)
+
+
+def response_text(response: Any) -> str:
+    """Returns the text of a (possibly partial) response, or an empty string if it has none."""
+    try:
+        return response.text if response and response.parts else ""
+    except ValueError:
+        # Raised by the SDK for blocked or empty candidates
+        return ""
+
+
+class TierStats:
+    def __init__(self):
+        self.calls = 0
+        self.escalations = 0
+        self.latency_total = 0.0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+
+class ModelRouter:
+    """
+    Routes each task to a model tier: a fast model first, and the pro model only
+    when the fast answer is empty or judged low-confidence. Tracks latency and
+    token usage per tier so the cost/latency trade-off can be tuned.
+    """
+
+    def __init__(self, tasks: Dict[str, List[str]]):
+        # task -> ordered list of model names to try
+        self.tasks = tasks
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        self._stats: Dict[str, TierStats] = {}
+
+    def model(self, name: str) -> genai.GenerativeModel:
+        if name not in self._models:
+            self._models[name] = genai.GenerativeModel(name)
+        return self._models[name]
+
+    def _record(self, name: str, started: float, response: Any, escalated: bool):
+        stats = self._stats.setdefault(name, TierStats())
+        stats.calls += 1
+        stats.escalations += int(escalated)
+        stats.latency_total += time.perf_counter() - started
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            stats.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+            stats.output_tokens += getattr(usage, "candidates_token_count", 0) or 0
+
+    async def stream(
+        self,
+        task: str,
+        contents: Any,
+        needs_escalation: Optional[Callable[[str], bool]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streams text chunks for `task`. A tier that may still be escalated is buffered until
+        its answer is complete and judged, so only the winning tier's text is ever yielded;
+        the last tier (or a task without an escalation check) streams live. A tier that fails
+        before yielding anything falls through to the next one.
+        """
+        tiers = self.tasks[task]
+        policy = ENDPOINTS["gemini_generate"]
+        breaker = get_breaker("gemini_generate")
+        for i, name in enumerate(tiers):
+            started = time.perf_counter()
+            is_last = i == len(tiers) - 1
+            buffered = not is_last and needs_escalation is not None
+            chunks = []
+            yielded = False
+            opened = False
+            try:
+                response = await call_with_resilience(
+                    "gemini_generate",
+                    lambda: self.model(name).generate_content_async(contents, stream=True),
+                    idempotent=True,
+                )
+                opened = True
+                # call_with_resilience only bounds opening the stream; reading it gets the rest
+                # of the deadline, counting only the time spent waiting on the model
+                remaining = policy.deadline() - (time.perf_counter() - started)
+                chunk_iterator = response.__aiter__()
+                while True:
+                    waiting_since = time.perf_counter()
+                    try:
+                        chunk = await asyncio.wait_for(chunk_iterator.__anext__(), timeout=remaining)
+                    except StopAsyncIteration:
+                        break
+                    remaining -= time.perf_counter() - waiting_since
+                    chunk_text = response_text(chunk)
+                    if chunk_text:
+                        chunks.append(chunk_text)
+                        if not buffered:
+                            yielded = True
+                            yield chunk_text
+            except Exception as e:
+                if opened and is_retryable(e):
+                    breaker.record_failure()
+                if is_last or yielded:
+                    raise
+                logger.warning(f"'{task}' failed on {name} ({type(e).__name__}: {e}), falling through to {tiers[i + 1]}")
+                continue
+
+            escalate = buffered and needs_escalation("".join(chunks))
+            self._record(name, started, response, escalate)
+            if not escalate:
+                if buffered:
+                    for chunk_text in chunks:
+                        yield chunk_text
+                break
+            logger.info(f"Escalating '{task}' from {name} to {tiers[i + 1]}, discarding its answer")
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns calls, escalations, average latency and token usage per model."""
+        return {
+            name: {
+                "calls": s.calls,
+                "escalations": s.escalations,
+                "latency_avg_ms": s.latency_total / s.calls * 1000 if s.calls else 0.0,
+                "prompt_tokens": s.prompt_tokens,
+                "output_tokens": s.output_tokens,
+            }
+            for name, s in self._stats.items()
+        }
+
+
+model_router = ModelRouter({
+    "caption": [GEMINI_CAPTION_MODEL, GEMINI_ESCALATION_MODEL],
+    "video": [GEMINI_VIDEO_MODEL],
+})
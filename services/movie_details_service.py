@@ -0,0 +1,126 @@
+import html
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from models.movie import Movie
+from models.movie_cast import MovieCast
+from models.movie_crew import MovieCrew
+
+# Number of cast/crew lines per page
+CREDITS_PAGE_SIZE = 15
+# Maximum number of movies whose rendered credit pages are kept in memory
+CREDITS_CACHE_SIZE = 512
+
+# (tmdb_id) -> (updated_at, title, rendered pages)
+_credits_cache: "OrderedDict[int, Tuple[object, str, List[str]]]" = OrderedDict()
+
+
+async def get_movie_with_credits(session, tmdb_id: int) -> Optional[Movie]:
+    """
+    Loads a movie with its cast and crew (and their people) eagerly.
+    Always issues three statements regardless of the number of credits.
+    """
+    result = await session.execute(
+        select(Movie)
+        .where(Movie.tmdb_id == tmdb_id)
+        .options(
+            selectinload(Movie.cast).joinedload(MovieCast.person),
+            selectinload(Movie.crew).joinedload(MovieCrew.person),
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+def _sorted_cast(movie: Movie) -> List[MovieCast]:
+    return sorted(
+        (c for c in movie.cast if c.person),
+        key=lambda c: (c.cast_order is None, c.cast_order or 0),
+    )
+
+
+def _sorted_crew(movie: Movie) -> List[MovieCrew]:
+    return sorted(
+        (c for c in movie.crew if c.person),
+        key=lambda c: (c.department or "", c.job or "", c.person.name),
+    )
+
+
+def format_credits_summary(movie: Movie, top_cast: int = 5) -> str:
+    """Formats the director(s) and top-billed cast of an eagerly loaded movie."""
+    text = ""
+    directors = [c.person.name for c in _sorted_crew(movie) if c.job == "Director"]
+    if directors:
+        text += f"🎬 <b>Director:</b> {html.escape(', '.join(directors))}\n"
+    stars = [c.person.name for c in _sorted_cast(movie)[:top_cast]]
+    if stars:
+        text += f"👥 <b>Starring:</b> {html.escape(', '.join(stars))}\n"
+    return text
+
+
+def _render_credit_pages(movie: Movie) -> List[str]:
+    """Renders cast (by cast_order) followed by crew into fixed-size pages."""
+    lines = []
+    cast = _sorted_cast(movie)
+    if cast:
+        lines.append("<b>Cast</b>")
+        for c in cast:
+            line = f"• {html.escape(c.person.name)}"
+            if c.character_name:
+                line += f" — <i>{html.escape(c.character_name)}</i>"
+            lines.append(line)
+
+    crew = _sorted_crew(movie)
+    if crew:
+        lines.append("<b>Crew</b>")
+        for c in crew:
+            lines.append(f"• {html.escape(c.person.name)} — {html.escape(c.job or c.department or '')}")
+
+    if not lines:
+        return []
+    return [
+        "\n".join(lines[i:i + CREDITS_PAGE_SIZE])
+        for i in range(0, len(lines), CREDITS_PAGE_SIZE)
+    ]
+
+
+async def get_credits_page(session, tmdb_id: int, page: int) -> Optional[Tuple[str, int, int]]:
+    """
+    Returns (text, page, total_pages) for a movie's cast & crew, or None if the movie is unknown.
+    Rendered pages are memoized and re-rendered when the movie's updated_at changes.
+    """
+    result = await session.execute(
+        select(Movie.updated_at).where(Movie.tmdb_id == tmdb_id)
+    )
+    row = result.first()
+    if row is None:
+        invalidate_movie_cache(tmdb_id)
+        return None
+    updated_at = row[0]
+
+    cached = _credits_cache.get(tmdb_id)
+    if cached and cached[0] == updated_at:
+        _credits_cache.move_to_end(tmdb_id)
+        _, title, pages = cached
+    else:
+        movie = await get_movie_with_credits(session, tmdb_id)
+        if not movie:
+            return None
+        title = movie.title
+        pages = _render_credit_pages(movie)
+        _credits_cache[tmdb_id] = (updated_at, title, pages)
+        _credits_cache.move_to_end(tmdb_id)
+        while len(_credits_cache) > CREDITS_CACHE_SIZE:
+            _credits_cache.popitem(last=False)
+
+    if not pages:
+        return f"🎬 <b>{html.escape(title)}</b>\n\nNo cast or crew information available.", 0, 1
+
+    page = max(0, min(page, len(pages) - 1))
+    header = f"🎬 <b>{html.escape(title)}</b> — Cast &amp; Crew ({page + 1}/{len(pages)})\n\n"
+    return header + pages[page], page, len(pages)
+
+
+def invalidate_movie_cache(tmdb_id: int):
+    """Drops memoized credit pages for a movie."""
+    _credits_cache.pop(tmdb_id, None)
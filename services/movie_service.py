@@ -1,7 +1,9 @@
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List
 import tmdbsimple as tmdb
-from sqlalchemy import select
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql.expression import func
 from sqlalchemy.exc import IntegrityError
 from models import get_session
@@ -9,16 +11,30 @@ from models.movie import Movie
 from models.person import Person
 from models.movie_cast import MovieCast
 from models.movie_crew import MovieCrew
+from services.movie_details_service import invalidate_movie_cache
+from services.resilience import call_blocking
+from services.single_flight import single_flight
 from config import TMDB_API_KEY
 from logger import get_logger
 
 tmdb.API_KEY = TMDB_API_KEY
+# Socket-level (connect, read) timeouts for tmdbsimple's requests session
+tmdb.REQUESTS_TIMEOUT = (5, 10)
+
+# Maximum number of title -> TMDb search results kept in memory
+TITLE_SEARCH_CACHE_SIZE = 2048
+_title_search_cache: "OrderedDict[str, List[dict]]" = OrderedDict()
+# Details fetched speculatively, consumed by fetch_and_save_movie
+PREFETCHED_DETAILS_SIZE = 256
+_prefetched_details: "OrderedDict[int, tuple]" = OrderedDict()
+# People inserted per statement (4 bind parameters each)
+PEOPLE_BATCH_SIZE = 1000
 
 
 async def fetch_and_save_upcoming_movies(session, page=1, limit=None):
     """Fetches upcoming movies from TMDb and saves them to the database."""
     movies_api = tmdb.Movies()
-    response = movies_api.upcoming(page=page)
+    response = await call_blocking("tmdb", movies_api.upcoming, page=page, idempotent=True)
 
     results = response.get("results", [])
     if limit:
@@ -35,17 +51,39 @@ async def fetch_and_save_upcoming_movies(session, page=1, limit=None):
     return saved_movies
 
 
-async def search_movie_by_title(query: str) -> dict | None:
-    """Searches for a movie by title on TMDb and returns the first result."""
+async def search_movie_candidates(query: str, year: int | None = None) -> List[dict]:
+    """Searches for a movie by title (and optionally year) on TMDb and returns the first page of results."""
+    key = f"{query.strip().lower()}|{year or ''}"
+    params = {"query": query}
+    if year:
+        params["year"] = year
+    if key in _title_search_cache:
+        _title_search_cache.move_to_end(key)
+        return _title_search_cache[key]
     try:
         search = tmdb.Search()
-        response = search.movie(query=query)
-        if response['results']:
-            return response['results'][0]
-        return None
+        # Early background lookups and user requests for the same title share one call
+        response = await single_flight.run(
+            ("tmdb_search", key), lambda: call_blocking("tmdb", search.movie, idempotent=True, **params)
+        )
+        results = response['results'] or []
+        _title_search_cache[key] = results
+        while len(_title_search_cache) > TITLE_SEARCH_CACHE_SIZE:
+            _title_search_cache.popitem(last=False)
+        return results
     except Exception as e:
         print(f"❌ Error searching for movie '{query}': {e}")
-        return None
+        return []
+
+
+async def search_movies(query: str, limit: int = 10) -> List[dict]:
+    """Searches TMDb for movies matching a query and returns up to `limit` results."""
+    try:
+        response = await call_blocking("tmdb", tmdb.Search().movie, query=query, idempotent=True)
+        return response.get('results', [])[:limit]
+    except Exception as e:
+        get_logger().warning(f"Error searching TMDb for '{query}': {e}")
+        return []
 
 
 async def fetch_and_save_movie(session, tmdb_id: int):
@@ -57,8 +95,28 @@ async def fetch_and_save_movie(session, tmdb_id: int):
         print(f"ℹ️ Movie with TMDB ID {tmdb_id} already exists in the database.")
         return None
 
+    details = _prefetched_details.pop(tmdb_id, None)
+    if details is None:
+        details = await call_blocking("tmdb", _fetch_movie_details, tmdb_id, idempotent=True)
+    movie_data, cast_list, crew_list = details
+    movie = await save_movie_with_cast_and_crew(session, movie_data, cast_list, crew_list)
+    return movie
+
+
+async def prefetch_movie_details(tmdb_id: int):
+    """Fetches details and credits ahead of time so a later fetch_and_save_movie skips TMDb."""
+    if tmdb_id in _prefetched_details:
+        return
+    _prefetched_details[tmdb_id] = await call_blocking("tmdb", _fetch_movie_details, tmdb_id, idempotent=True)
+    while len(_prefetched_details) > PREFETCHED_DETAILS_SIZE:
+        _prefetched_details.popitem(last=False)
+
+
+def _fetch_movie_details(tmdb_id: int):
+    """Fetches movie info and credits from TMDb and returns (movie_data, cast_list, crew_list)."""
     movie_api = tmdb.Movies(tmdb_id)
-    info = movie_api.info()
+    # One round trip for details and credits
+    info = movie_api.info(append_to_response="credits")
     release_date_str = info.get("release_date")
     release_date = None
     if release_date_str:
@@ -79,32 +137,53 @@ async def fetch_and_save_movie(session, tmdb_id: int):
                       f"https://image.tmdb.org/t/p/original{info['poster_path']}"
     }
 
-    credits = movie_api.credits()
-    cast_list = credits.get("cast", [])
-    crew_list = credits.get("crew", [])
+    credits = info.get("credits", {})
+    return movie_data, credits.get("cast", []), credits.get("crew", [])
 
-    movie = await save_movie_with_cast_and_crew(session, movie_data, cast_list, crew_list)
+
+async def enrich_movie(session, movie: Movie):
+    """
+    Fills in details, cast and crew for a movie row that was created without them
+    (e.g. by the bulk importer).
+    """
+    movie_data, cast_list, crew_list = await call_blocking("tmdb", _fetch_movie_details, movie.tmdb_id, idempotent=True)
+
+    for field in ("title", "overview", "release_date", "popularity", "vote_average", "genres", "poster_url"):
+        value = movie_data.get(field)
+        if value is not None:
+            setattr(movie, field, value)
+
+    movie.enriched_at = datetime.now()
+    await _add_cast_and_crew(session, movie, cast_list, crew_list)
+    await session.commit()
+    invalidate_movie_cache(movie.tmdb_id)
     return movie
 
 
-async def get_or_create_person(session, person_data):
-    """Finds a person by tmdb_id or creates a new one."""
-    result = await session.execute(
-        select(Person).where(Person.tmdb_id == person_data["id"])
-    )
-    person = result.scalar_one_or_none()
-    if person:
-        return person
-
-    person = Person(
-        tmdb_id=person_data["id"],
-        name=person_data["name"],
-        profile_url=person_data.get("profile_path"),
-        known_for_department=person_data.get("known_for_department"),
-    )
-    session.add(person)
-    await session.flush()
-    return person
+async def _upsert_people(session, people: List[dict]) -> Dict[int, int]:
+    """
+    Inserts missing people with ON CONFLICT DO NOTHING, so concurrent workers saving
+    movies with shared people cannot collide, and returns tmdb_id -> people.id.
+    """
+    unique = {p["id"]: p for p in people}
+    if not unique:
+        return {}
+    rows = [
+        {
+            "tmdb_id": p["id"],
+            "name": p["name"],
+            "profile_url": p.get("profile_path"),
+            "known_for_department": p.get("known_for_department"),
+        }
+        for p in unique.values()
+    ]
+    for start in range(0, len(rows), PEOPLE_BATCH_SIZE):
+        await session.execute(
+            insert(Person).values(rows[start:start + PEOPLE_BATCH_SIZE])
+            .on_conflict_do_nothing(index_elements=["tmdb_id"])
+        )
+    result = await session.execute(select(Person.tmdb_id, Person.id).where(Person.tmdb_id.in_(list(unique))))
+    return dict(result.all())
 
 
 async def save_movie_with_cast_and_crew(session, movie_data, cast_list, crew_list):
@@ -118,29 +197,12 @@ async def save_movie_with_cast_and_crew(session, movie_data, cast_list, crew_lis
         vote_average=movie_data.get("vote_average"),
         genres=movie_data.get("genres", []),
         poster_url=movie_data.get("poster_url"),
+        enriched_at=datetime.now(),
     )
     session.add(movie)
     await session.flush()
 
-    for c in cast_list:
-        person = await get_or_create_person(session, c)
-        cast_entry = MovieCast(
-            movie_id=movie.id,
-            person_id=person.id,
-            character_name=c.get("character"),
-            cast_order=c.get("order"),
-        )
-        session.add(cast_entry)
-
-    for c in crew_list:
-        person = await get_or_create_person(session, c)
-        crew_entry = MovieCrew(
-            movie_id=movie.id,
-            person_id=person.id,
-            job=c.get("job"),
-            department=c.get("department"),
-        )
-        session.add(crew_entry)
+    await _add_cast_and_crew(session, movie, cast_list, crew_list)
 
     try:
         await session.commit()
@@ -153,6 +215,29 @@ async def save_movie_with_cast_and_crew(session, movie_data, cast_list, crew_lis
         return result.scalar_one_or_none()
 
 
+async def _add_cast_and_crew(session, movie, cast_list, crew_list):
+    """Replaces the cast and crew entries of a flushed movie."""
+    await session.execute(delete(MovieCast).where(MovieCast.movie_id == movie.id))
+    await session.execute(delete(MovieCrew).where(MovieCrew.movie_id == movie.id))
+    person_ids = await _upsert_people(session, cast_list + crew_list)
+
+    for c in cast_list:
+        session.add(MovieCast(
+            movie_id=movie.id,
+            person_id=person_ids[c["id"]],
+            character_name=c.get("character"),
+            cast_order=c.get("order"),
+        ))
+
+    for c in crew_list:
+        session.add(MovieCrew(
+            movie_id=movie.id,
+            person_id=person_ids[c["id"]],
+            job=c.get("job"),
+            department=c.get("department"),
+        ))
+
+
 async def get_random_movie(session):
     """Returns a random movie from the database."""
     result = await session.execute(
@@ -165,18 +250,20 @@ async def search_and_save_movies_from_titles(titles: List[str]) -> Dict[str, Lis
     """
     Searches for a list of movie titles, saves them, and returns a summary of the operation.
     """
+    # Imported here because alias_service builds on this module
+    from services.alias_service import resolve_title
+
     saved_movies = []
     failed_titles = []
 
-    async for session in get_session():
+    async with get_session() as session:
         for title in titles:
             try:
-                search_result = await search_movie_by_title(title)
-                if not search_result:
+                tmdb_id = await resolve_title(title, session)
+                if tmdb_id is None:
                     failed_titles.append(title)
                     continue
 
-                tmdb_id = search_result.get("id")
                 movie = await fetch_and_save_movie(session, tmdb_id)
                 if movie:
                     saved_movies.append(movie.title)
@@ -0,0 +1,21 @@
+from typing import Dict, Optional
+from aiogram.types import Message
+
+# tmdb id -> Telegram file_id of a poster we already uploaded
+_poster_file_ids: Dict[int, str] = {}
+
+
+def get_poster_file_id(tmdb_id: int) -> Optional[str]:
+    """Returns the file_id of a previously sent poster, if any."""
+    return _poster_file_ids.get(tmdb_id)
+
+
+def get_poster(movie) -> Optional[str]:
+    """Returns a cached file_id for the movie's poster, falling back to its URL."""
+    return _poster_file_ids.get(movie.tmdb_id) or movie.poster_url
+
+
+def remember_poster(movie, message: Optional[Message]):
+    """Stores the file_id of a sent poster so later sends and inline results skip the re-upload."""
+    if message and message.photo:
+        _poster_file_ids[movie.tmdb_id] = message.photo[-1].file_id
@@ -0,0 +1,113 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Set
+from sqlalchemy import select
+from models import get_session
+from models.movie import Movie
+from services.movie_service import prefetch_movie_details
+from services.alias_service import resolve_title
+from services.reel_service import download_instagram_media, release_instagram_media, MediaFile
+from config import PREFETCH_ENABLED, PREFETCH_TTL, PREFETCH_MAX_CONCURRENT, PREFETCH_MAX_BYTES, MEDIA_POST_MAX_BYTES
+from logger import get_logger
+
+logger = get_logger()
+
+
+class _Prefetch:
+    """Background work started for one Instagram link, dropped after PREFETCH_TTL."""
+
+    def __init__(self, shortcode: str):
+        self.shortcode = shortcode
+        self.tasks: Set[asyncio.Task] = set()
+        # Bytes reserved while downloading, then the size actually held
+        self.video_bytes = 0
+        self.video_started = False
+        self.media: List[MediaFile] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+_prefetches: Dict[str, _Prefetch] = {}
+_semaphore = asyncio.Semaphore(PREFETCH_MAX_CONCURRENT)
+
+
+def _held_bytes() -> int:
+    """Bytes held or reserved by all prefetches, including downloads still running."""
+    return sum(p.video_bytes for p in _prefetches.values())
+
+
+def _get_or_create(shortcode: str) -> _Prefetch:
+    prefetch = _prefetches.get(shortcode)
+    if prefetch is None:
+        prefetch = _Prefetch(shortcode)
+        _prefetches[shortcode] = prefetch
+        prefetch.timer = asyncio.get_running_loop().call_later(PREFETCH_TTL, expire_prefetch, shortcode)
+    return prefetch
+
+
+def _spawn(prefetch: _Prefetch, coro):
+    task = asyncio.create_task(coro)
+    prefetch.tasks.add(task)
+    task.add_done_callback(prefetch.tasks.discard)
+
+
+async def _prefetch_video(prefetch: _Prefetch):
+    async with _semaphore:
+        available = PREFETCH_MAX_BYTES - _held_bytes()
+        if available <= 0:
+            logger.info(f"Skipping video prefetch for {prefetch.shortcode}: byte budget exhausted")
+            return
+        # Reserve the most this prefetch may download before it starts, so concurrent prefetches
+        # cannot together exceed PREFETCH_MAX_BYTES
+        prefetch.video_bytes = min(MEDIA_POST_MAX_BYTES, available)
+        files = []
+        try:
+            files = await download_instagram_media(prefetch.shortcode, max_bytes=prefetch.video_bytes)
+        finally:
+            # Keep the references until the prefetch expires so the files are not evicted before a click
+            prefetch.media = files
+            prefetch.video_bytes = sum(os.path.getsize(f.path) for f in files)
+        if files:
+            logger.info(f"Prefetched {len(files)} media file(s) for {prefetch.shortcode} ({prefetch.video_bytes} bytes)")
+
+
+async def _prefetch_title(title: str):
+    async with _semaphore:
+        async with get_session() as session:
+            tmdb_id = await resolve_title(title, session)
+            if tmdb_id is None:
+                return
+            exists = await session.scalar(select(Movie.id).where(Movie.tmdb_id == tmdb_id))
+        if exists is None:
+            await prefetch_movie_details(tmdb_id)
+
+
+def start_video_prefetch(shortcode: str):
+    """Starts downloading a post's video in the background, if prefetching is enabled."""
+    if not PREFETCH_ENABLED:
+        return
+    prefetch = _get_or_create(shortcode)
+    if not prefetch.video_started:
+        prefetch.video_started = True
+        _spawn(prefetch, _prefetch_video(prefetch))
+
+
+def prefetch_titles(shortcode: str, titles: List[str]):
+    """Resolves titles and fetches details of movies not yet in the database, if prefetching is enabled."""
+    if not PREFETCH_ENABLED or not titles:
+        return
+    prefetch = _get_or_create(shortcode)
+    for title in titles:
+        _spawn(prefetch, _prefetch_title(title))
+
+
+def expire_prefetch(shortcode: str):
+    """Cancels unfinished work for a link and releases its prefetched video."""
+    prefetch = _prefetches.pop(shortcode, None)
+    if prefetch is None:
+        return
+    if prefetch.timer:
+        prefetch.timer.cancel()
+    for task in list(prefetch.tasks):
+        task.cancel()
+    release_instagram_media(prefetch.media)
+    logger.info(f"Prefetch for {shortcode} expired")
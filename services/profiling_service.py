@@ -0,0 +1,165 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, Optional, Tuple
+from logger import get_logger
+
+logger = get_logger()
+
+# Leaf frames of threads that are just waiting (idle event loop, idle executor workers)
+IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+# Our own monitoring threads
+MONITOR_THREADS = ("stack-sampler", "loop-lag-monitor")
+# Number of functions listed in a profile summary
+TOP_FUNCTIONS = 40
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse_stack(frame) -> str:
+    """Formats a stack root-first as `a;b;c`, the collapsed format flame graph tools read."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def format_stack(frame) -> str:
+    """Formats a stack innermost-last with line numbers, for log messages."""
+    lines = []
+    while frame is not None:
+        lines.append(f"  {frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return "\n".join(reversed(lines))
+
+
+class StackSampler:
+    """
+    Samples the stacks of all threads every `interval` seconds into a ring buffer.
+    Cheap enough to leave running, and lets a slow update be explained after the fact
+    by looking at the samples taken while it ran, including blocking calls in worker threads.
+    """
+
+    def __init__(self, interval: float = 0.01, max_samples: int = 50_000):
+        self.interval = interval
+        self._samples: Deque[Tuple[float, str, str]] = deque(maxlen=max_samples)
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if name in MONITOR_THREADS or os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                self._samples.append((now, name, collapse_stack(frame)))
+
+    def collapsed_between(self, start: float, end: float) -> Counter:
+        """Counts collapsed stacks (prefixed with the thread name) sampled in [start, end]."""
+        return Counter(
+            f"{thread};{stack}" for at, thread, stack in list(self._samples) if start <= at <= end
+        )
+
+
+class ProfileWriter:
+    """Writes profile dumps to a directory, keeping only the newest `max_files` files."""
+
+    def __init__(self, directory: str, max_files: int = 200):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def _rotate(self):
+        files = sorted(self.directory.iterdir(), key=lambda p: p.stat().st_mtime)
+        for path in files[:max(0, len(files) - self.max_files)]:
+            path.unlink(missing_ok=True)
+
+    def write(self, label: str, collapsed: Counter, profile: Optional[cProfile.Profile] = None) -> Path:
+        """
+        Writes `<label>.collapsed` (sampled stacks) and `<label>.txt` (top functions, from
+        cProfile when available, otherwise from the samples' leaf frames). Blocking; run in a thread.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        base = self.directory / f"{datetime.now():%Y%m%d_%H%M%S_%f}_{label}"
+
+        if collapsed:
+            with open(f"{base}.collapsed", "w") as f:
+                for stack, count in collapsed.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        with open(f"{base}.txt", "w") as f:
+            if profile is not None:
+                stream = io.StringIO()
+                pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+                f.write(stream.getvalue())
+            else:
+                leaves: Counter = Counter()
+                for stack, count in collapsed.items():
+                    leaves[stack.rsplit(";", 1)[-1]] += count
+                total = sum(leaves.values()) or 1
+                f.write(f"{total} samples\n\n")
+                for name, count in leaves.most_common(TOP_FUNCTIONS):
+                    f.write(f"{count:8d} {100 * count / total:5.1f}%  {name}\n")
+
+        self._rotate()
+        return base
+
+
+class LoopLagMonitor:
+    """
+    Detects event-loop stalls. A coroutine stamps a heartbeat every `interval`; a watchdog
+    thread that finds the heartbeat older than `threshold` logs the loop thread's current
+    stack, i.e. the code that is blocking the loop, once per stall.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+
+    async def run(self):
+        self._loop_thread = threading.get_ident()
+        threading.Thread(target=self._watch, name="loop-lag-monitor", daemon=True).start()
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        reported = None
+        while True:
+            time.sleep(self.interval)
+            heartbeat = self._heartbeat
+            lag = time.monotonic() - heartbeat - self.interval
+            if lag < self.threshold or reported == heartbeat:
+                continue
+            reported = heartbeat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = format_stack(frame) if frame is not None else "  <unavailable>"
+            logger.warning(f"🐢 Event loop stalled for over {lag * 1000:.0f} ms, blocked in:\n{stack}")
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"stalls": self.stalls}
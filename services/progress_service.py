@@ -0,0 +1,35 @@
+import time
+from typing import Optional
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+from logger import get_logger
+
+logger = get_logger()
+
+
+class ProgressMessage:
+    """
+    Edits a status message as results arrive, at most once per `min_interval`
+    seconds to stay clear of Telegram's edit flood limits.
+    """
+
+    def __init__(self, message: Message, min_interval: float = 1.5):
+        self.message = message
+        self.min_interval = min_interval
+        self._last_edit = 0.0
+        self._last_text: Optional[str] = None
+
+    async def update(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None, force: bool = False):
+        """Edits the message unless the last edit was too recent (ignored unless `force`)."""
+        now = time.monotonic()
+        if not force and now - self._last_edit < self.min_interval:
+            return
+        if text == self._last_text and reply_markup is None:
+            return
+        try:
+            await self.message.edit_text(text, reply_markup=reply_markup)
+            self._last_edit = now
+            self._last_text = text
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.warning(f"Failed to edit progress message: {e}")
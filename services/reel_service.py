@@ -1,30 +1,42 @@
 import asyncio
 import os
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import AsyncIterator, List, Optional, Dict
 import aiohttp
 import google.generativeai as genai
-from config import GEMINI_API_KEY, FASTSAVER_API_TOKEN
+from config import FASTSAVER_API_TOKEN, MEDIA_POST_MAX_BYTES
+from services.single_flight import single_flight
+from services.media_cache import MediaCache, media_cache, image_cache
+from services.resilience import call_with_resilience, call_blocking, scale_deadline, TransientError, RETRYABLE_STATUSES
+from services.model_router import model_router
 from logger import get_logger
 
 logger = get_logger()
 
-# Configure Generative AI
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-pro')
-
 # API endpoint
 API_BASE_URL = "https://fastsaverapi.com/get-info"
 
+# Socket-level timeouts; overall deadlines come from the resilience policies
+CLIENT_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=10, sock_read=30)
+# Maximum time to wait for Gemini to finish processing an uploaded video
+GEMINI_PROCESSING_TIMEOUT = 300
+
 async def _fetch_media_info(shortcode: str) -> Optional[Dict]:
+    """Fetches media information, sharing one request between concurrent callers."""
+    return await single_flight.run(("media_info", shortcode), lambda: _request_media_info(shortcode))
+
+async def _request_media_info(shortcode: str) -> Optional[Dict]:
     """Fetches media information from the FastSaverAPI."""
     params = {
         "url": f"https://www.instagram.com/p/{shortcode}/",
         "token": FASTSAVER_API_TOKEN
     }
-    try:
-        async with aiohttp.ClientSession() as session:
+
+    async def _request():
+        async with aiohttp.ClientSession(timeout=CLIENT_TIMEOUT) as session:
             async with session.get(API_BASE_URL, params=params) as response:
+                if response.status in RETRYABLE_STATUSES:
+                    raise TransientError(f"FastSaverAPI returned {response.status}")
                 if response.status == 200:
                     data = await response.json()
                     if not data.get("error"):
@@ -36,6 +48,9 @@ async def _fetch_media_info(shortcode: str) -> Optional[Dict]:
                 else:
                     logger.error(f"❌ Failed to fetch info for {shortcode}. Status: {response.status}")
                     return None
+
+    try:
+        return await call_with_resilience("fastsaver", _request, idempotent=True)
     except Exception as e:
         logger.error(f"❌ Exception while fetching media info for {shortcode}: {e}", exc_info=True)
         return None
@@ -45,123 +60,368 @@ async def get_post_caption(shortcode: str) -> Optional[str]:
     media_info = await _fetch_media_info(shortcode)
     return media_info.get("caption") if media_info else None
 
-async def download_instagram_video(shortcode: str) -> Optional[str]:
-    """Downloads a video from an Instagram post using the new API."""
+class MediaItem:
+    """One video or photo of a post, as listed by FastSaverAPI."""
+
+    def __init__(self, shortcode: str, index: int, kind: str, url: str):
+        self.shortcode = shortcode
+        self.index = index
+        self.kind = kind
+        self.url = url
+
+    @property
+    def key(self) -> str:
+        # The first item keeps the single-video key so existing cache entries stay valid
+        if self.index == 0:
+            return f"instagram:{self.shortcode}"
+        return f"instagram:{self.shortcode}:{self.index}"
+
+    @property
+    def cache(self) -> MediaCache:
+        return image_cache if self.kind == "image" else media_cache
+
+
+class MediaFile:
+    """A locally cached post item; hold it until passed to release_instagram_media()."""
+
+    def __init__(self, item: MediaItem, path: str):
+        self.item = item
+        self.kind = item.kind
+        self.path = path
+
+
+class _PostBudget:
+    """
+    Bytes that the in-flight downloads of one post may use between them. Shared by every
+    caller of the post, so its limit is the largest budget among them (at most MEDIA_POST_MAX_BYTES)
+    and a caller joining another's downloads is not held to the smaller budget.
+    """
+
+    def __init__(self):
+        self.limits: List[int] = []
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        return min(max(self.limits, default=0), MEDIA_POST_MAX_BYTES) - self.used
+
+    def take(self, size: int) -> bool:
+        if size > self.remaining:
+            return False
+        self.used += size
+        return True
+
+    def give_back(self, size: int):
+        self.used -= size
+
+
+# shortcode -> budget of the post's downloads while any caller is waiting on them
+_post_budgets: Dict[str, _PostBudget] = {}
+
+
+def _media_kind(entry: Dict) -> str:
+    return "image" if (entry.get("type") or "").lower() in ("image", "photo") else "video"
+
+
+def _media_items(shortcode: str, media_info: Dict) -> List[MediaItem]:
+    """Lists a post's items; carousels come as a `medias` list, single posts as a top-level download_url."""
+    entries = media_info.get("medias")
+    if not entries:
+        entries = [media_info] if media_info.get("download_url") else []
+    items = []
+    for entry in entries:
+        if entry.get("download_url"):
+            items.append(MediaItem(shortcode, len(items), _media_kind(entry), entry["download_url"]))
+    return items
+
+
+async def download_instagram_media(shortcode: str, max_bytes: int = MEDIA_POST_MAX_BYTES) -> List[MediaFile]:
+    """
+    Returns local copies of every video and photo of a post, downloading cache misses concurrently.
+    Downloads stop once the post's items exceed the byte budget; afterwards the items are charged
+    to `max_bytes` in order, whether cached or fetched for this or a concurrent caller, and those
+    that no longer fit are skipped.
+    The result must be passed to release_instagram_media() when no longer needed.
+    """
     media_info = await _fetch_media_info(shortcode)
-    if not media_info or not media_info.get("download_url"):
-        logger.error(f"Could not get download URL for {shortcode}")
-        return None
+    items = _media_items(shortcode, media_info) if media_info else []
+    if not items:
+        logger.error(f"Could not get download URLs for {shortcode}")
+        return []
 
-    download_url = media_info["download_url"]
-    
+    budget = _post_budgets.setdefault(shortcode, _PostBudget())
+    budget.limits.append(max_bytes)
     try:
-        logger.info(f"Downloading video for shortcode: {shortcode}")
-        download_dir = Path("downloads")
-        download_dir.mkdir(exist_ok=True)
-        # Use the shortcode to create a unique filename
-        video_path = download_dir / f"{shortcode}.mp4"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(download_url) as response:
-                if response.status == 200:
-                    with open(video_path, "wb") as f:
+        results = await asyncio.gather(
+            *(item.cache.acquire(item.key, lambda dest, item=item: _download_item(item, dest, budget)) for item in items),
+            return_exceptions=True,
+        )
+    finally:
+        budget.limits.remove(max_bytes)
+        if not budget.limits:
+            del _post_budgets[shortcode]
+
+    files = []
+    remaining = max_bytes
+    for item, result in zip(items, results):
+        if isinstance(result, BaseException):
+            logger.error(f"❌ Error caching item {item.index} of {shortcode}: {result}")
+        elif result:
+            size = os.path.getsize(result)
+            if size > remaining:
+                logger.warning(f"Skipping item {item.index} of {shortcode}: over the post byte budget")
+                item.cache.release(item.key)
+                continue
+            remaining -= size
+            files.append(MediaFile(item, str(result)))
+    if len(files) < len(items):
+        logger.warning(f"Got {len(files)} of {len(items)} items for {shortcode}")
+    return files
+
+def release_instagram_media(files: List[MediaFile]):
+    """Marks files returned by download_instagram_media() as no longer in use."""
+    for media_file in files:
+        media_file.item.cache.release(media_file.item.key)
+
+async def _download_item(item: MediaItem, path: Path, budget: _PostBudget) -> bool:
+    """Streams one post item to `path`, charging its bytes to the post's budget."""
+
+    async def _download():
+        taken = 0
+        done = False
+        try:
+            async with aiohttp.ClientSession(timeout=CLIENT_TIMEOUT) as session:
+                async with session.get(item.url) as response:
+                    if response.status in RETRYABLE_STATUSES:
+                        raise TransientError(f"CDN returned {response.status}")
+                    if response.status != 200:
+                        logger.error(f"❌ Failed to download {item.kind} from {item.url}. Status: {response.status}")
+                        return False
+                    if response.content_length:
+                        # Reserve the announced size up front so concurrent items cannot overshoot together
+                        if not budget.take(response.content_length):
+                            logger.warning(f"Skipping item {item.index} of {item.shortcode}: over the post byte budget")
+                            return False
+                        taken = response.content_length
+                        scale_deadline(response.content_length)
+                    written = 0
+                    with open(path, "wb") as f:
                         while True:
-                            chunk = await response.content.read(1024)
+                            chunk = await response.content.read(64 * 1024)
                             if not chunk:
                                 break
+                            written += len(chunk)
+                            if written > taken:
+                                if not budget.take(written - taken):
+                                    logger.warning(f"Stopped item {item.index} of {item.shortcode}: over the post byte budget")
+                                    return False
+                                taken = written
                             f.write(chunk)
-                    logger.info(f"✅ Video downloaded successfully: {video_path}")
-                    return str(video_path)
-                else:
-                    logger.error(f"❌ Failed to download video from {download_url}. Status: {response.status}")
-                    return None
+                    logger.info(f"✅ {item.kind.capitalize()} downloaded successfully: {path}")
+                    done = True
+                    return True
+        finally:
+            if not done:
+                # A failed attempt's bytes are freed; a retry downloads from scratch
+                budget.give_back(taken)
 
+    try:
+        logger.info(f"Downloading item {item.index} ({item.kind}) for shortcode: {item.shortcode}")
+        # The deadline is rescaled by the response's Content-Length once the headers arrive
+        return await call_with_resilience("cdn", _download, idempotent=True)
     except Exception as e:
-        logger.error(f"❌ Error downloading video from {shortcode}: {e}", exc_info=True)
-        return None
+        logger.error(f"❌ Error downloading item {item.index} of {item.shortcode}: {e}", exc_info=True)
+        return False
+
+
+CONFIDENCE_MARKER = "CONFIDENCE:"
+# Lines longer than this are treated as prose rather than a title
+MAX_TITLE_LENGTH = 120
+
+def _is_title_line(line: str) -> bool:
+    return bool(line) and not line.upper().startswith(CONFIDENCE_MARKER)
+
+def _parse_titles(text: str) -> List[str]:
+    """Splits model output into titles, dropping the confidence line."""
+    return [line.strip() for line in text.split('\n') if _is_title_line(line.strip())]
+
+async def _titles_from_chunks(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Turns streamed text chunks into titles as soon as each line is complete, skipping repeats."""
+    seen = set()
+    buffer = ""
 
+    def _new_titles(lines):
+        for line in lines:
+            title = line.strip()
+            if _is_title_line(title) and title.lower() not in seen:
+                seen.add(title.lower())
+                yield title
 
-async def extract_movie_titles_from_caption(caption: str) -> List[str]:
-    """Extracts movie titles from a given text using a generative AI model."""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        for title in _new_titles(lines):
+            yield title
+    for title in _new_titles([buffer]):
+        yield title
+
+def _caption_needs_escalation(text: str) -> bool:
+    """Escalate on empty output, a self-reported low confidence, or output that does not look like titles."""
+    titles = _parse_titles(text)
+    if not titles:
+        return True
+    if f"{CONFIDENCE_MARKER} LOW" in text.upper():
+        return True
+    return any(len(title) > MAX_TITLE_LENGTH for title in titles)
+
+async def stream_movie_titles_from_caption(caption: str) -> AsyncIterator[str]:
+    """
+    Yields movie titles from a caption. The fast model's answer is only released once it is
+    judged good enough; otherwise titles come from the escalated model as it generates them.
+    """
     if not caption:
-        return []
+        return
     try:
         prompt = f"""
         From the following text, please extract all movie titles you can find.
         List each movie title on a new line. Do not provide any extra explanation, just the titles.
+        After the titles, write one last line: "{CONFIDENCE_MARKER} HIGH" if you are sure about the list,
+        or "{CONFIDENCE_MARKER} LOW" if the text is ambiguous.
 
         Text: "{caption}"
 
         Movie Titles:
         """
-        response = await model.generate_content_async(prompt)
-        if response.parts:
-            titles = [title.strip() for title in response.parts[0].text.split('\n') if title.strip()]
-            return titles
-        return []
+        chunks = model_router.stream("caption", prompt, needs_escalation=_caption_needs_escalation)
+        async for title in _titles_from_chunks(chunks):
+            yield title
     except Exception as e:
         logger.error(f"❌ Error extracting movie titles with AI: {e}")
-        return []
 
-async def extract_movie_titles_from_video(shortcode: str) -> list[str]:
+
+class _TitleBroadcast:
+    """Fans out titles from one video analysis to every caller waiting on the same shortcode."""
+
+    def __init__(self):
+        self.titles: List[str] = []
+        self.done = False
+        self._changed = asyncio.Condition()
+
+    async def publish(self, title: str):
+        async with self._changed:
+            self.titles.append(title)
+            self._changed.notify_all()
+
+    async def finish(self):
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or len(self.titles) > index)
+                new_titles = self.titles[index:]
+                finished = self.done
+            for title in new_titles:
+                yield title
+            index += len(new_titles)
+            if finished and index >= len(self.titles):
+                return
+
+
+# shortcode -> analysis currently running for it
+_video_analyses: Dict[str, _TitleBroadcast] = {}
+# Strong references so running analyses are not garbage collected
+_analysis_tasks: set = set()
+
+async def stream_movie_titles_from_video(shortcode: str) -> AsyncIterator[str]:
     """
-    Downloads a video, uploads it to Gemini, and uses it to find movie titles.
+    Yields movie titles found in a post's video as Gemini generates them.
+    Concurrent requests for the same shortcode share one analysis.
     """
-    video_path = None
-    video_file = None
-    try:
-        video_path = await download_instagram_video(shortcode)
-        if not video_path:
-            return []
-
-        logger.info(f"Uploading video file {video_path} to Gemini...")
-        loop = asyncio.get_event_loop()
-        video_file_response = await loop.run_in_executor(
-            None, lambda: genai.upload_file(path=video_path)
-        )
-        logger.info(f"File upload started for {video_file_response.name}. Waiting for it to become active.")
+    broadcast = _video_analyses.get(shortcode)
+    if broadcast is None:
+        broadcast = _TitleBroadcast()
+        _video_analyses[shortcode] = broadcast
+        task = asyncio.create_task(_analyze_video(shortcode, broadcast))
+        _analysis_tasks.add(task)
+        task.add_done_callback(_analysis_tasks.discard)
+    else:
+        logger.info(f"Joining in-flight video analysis for {shortcode}")
 
-        while video_file_response.state.name == "PROCESSING":
-            await asyncio.sleep(5)
-            video_file_response = await loop.run_in_executor(
-                None, lambda: genai.get_file(name=video_file_response.name)
-            )
-            logger.info(f"Current file state: {video_file_response.state.name}")
+    async for title in broadcast.subscribe():
+        yield title
 
-        if video_file_response.state.name != "ACTIVE":
-            logger.error(f"File {video_file_response.name} failed processing. State: {video_file_response.state.name}")
-            return []
+async def _wait_until_active(remote_file):
+    """Polls an uploaded Gemini file until processing ends; returns it if ACTIVE, otherwise None."""
+    deadline = asyncio.get_running_loop().time() + GEMINI_PROCESSING_TIMEOUT
+    while remote_file.state.name == "PROCESSING":
+        if asyncio.get_running_loop().time() > deadline:
+            logger.error(f"File {remote_file.name} is still processing after {GEMINI_PROCESSING_TIMEOUT}s")
+            return None
+        await asyncio.sleep(5)
+        remote_file = await call_blocking("gemini_files", genai.get_file, name=remote_file.name, idempotent=True)
+        logger.info(f"Current state of {remote_file.name}: {remote_file.state.name}")
 
-        logger.info(f"✅ File {video_file_response.name} is now ACTIVE.")
-        video_file = video_file_response
+    if remote_file.state.name != "ACTIVE":
+        logger.error(f"File {remote_file.name} failed processing. State: {remote_file.state.name}")
+        return None
+    logger.info(f"✅ File {remote_file.name} is now ACTIVE.")
+    return remote_file
+
+async def _analyze_video(shortcode: str, broadcast: _TitleBroadcast):
+    files: List[MediaFile] = []
+    uploaded = []
+    try:
+        files = await download_instagram_media(shortcode)
+        if not files:
+            return
+
+        logger.info(f"Uploading {len(files)} media file(s) of {shortcode} to Gemini...")
+        uploads = await asyncio.gather(
+            # Uploads are not idempotent, so they get a single attempt with a size-scaled deadline
+            *(
+                call_blocking("gemini_files", genai.upload_file, path=f.path, expected_bytes=os.path.getsize(f.path))
+                for f in files
+            ),
+            return_exceptions=True,
+        )
+        # Keep handles right away so remote files are deleted even if processing fails
+        for result in uploads:
+            if isinstance(result, BaseException):
+                logger.error(f"❌ Failed to upload a media file of {shortcode}: {result}")
+            else:
+                uploaded.append(result)
+
+        active = [f for f in await asyncio.gather(*(_wait_until_active(f) for f in uploaded)) if f]
+        if not active:
+            return
 
         prompt = """
-        From the video, please extract all movie titles you can find.
-        If there are none, please try to find the movie or movies that are in the video.
+        From the video clips and images of this post, please extract all movie titles you can find.
+        If there are none, please try to find the movie or movies that are shown.
         List each movie title on a new line. Do not provide any extra explanation, just the titles.
         If no movie title is mentioned, return an empty response.
         """
 
-        response = await model.generate_content_async([prompt, video_file])
-
-        if response.parts:
-            titles = [title.strip() for title in response.parts[0].text.split('\n') if title.strip()]
-            logger.info(f"Found titles from video: {titles}")
-            return titles
-        return []
+        # All items go to the model in one multi-part request
+        async for title in _titles_from_chunks(model_router.stream("video", [prompt, *active])):
+            logger.info(f"Found title from video {shortcode}: {title}")
+            await broadcast.publish(title)
 
     except Exception as e:
         logger.error(f"❌ Error extracting titles from video for {shortcode}: {e}", exc_info=True)
-        return []
     finally:
-        if video_path and os.path.exists(video_path):
-            os.remove(video_path)
-            logger.info("Cleaned up temporary video file.")
-        
-        if video_file:
+        _video_analyses.pop(shortcode, None)
+        await broadcast.finish()
+
+        release_instagram_media(files)
+
+        for remote_file in uploaded:
             try:
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, lambda: genai.delete_file(name=video_file.name))
-                logger.info(f"Deleted remote file {video_file.name}.")
+                await call_blocking("gemini_files", genai.delete_file, name=remote_file.name, idempotent=True)
+                logger.info(f"Deleted remote file {remote_file.name}.")
             except Exception as e:
-                logger.error(f"❌ Failed to delete remote file {video_file.name}: {e}")
\ No newline at end of file
+                logger.error(f"❌ Failed to delete remote file {remote_file.name}: {e}")
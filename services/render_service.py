@@ -0,0 +1,215 @@
+import html
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from models.movie import Movie
+
+# Telegram limits for photo captions and text messages
+CAPTION_LIMIT = 1024
+MESSAGE_LIMIT = 4096
+
+USER_CARD = "user_card"
+CHANNEL_POST = "channel_post"
+WATCHLIST_ROW = "watchlist_row"
+
+# Room always kept for the movie itself when a caption has a prefix or suffix
+MIN_BODY_LENGTH = 200
+
+# Maximum number of rendered captions kept in memory
+RENDER_CACHE_SIZE = 4096
+
+# (movie id, updated_at, template, limit) -> caption
+_render_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+
+
+def _overview_block(overview: str) -> str:
+    return f"\n📝 <b>Overview:</b>\n{html.escape(overview)}\n"
+
+
+def _user_card_parts(movie: Movie) -> Tuple[str, str, str]:
+    text = f"🎬 <b>{html.escape(movie.title)}</b>\n\n"
+    if movie.release_date:
+        text += f"📅 <b>Release Date:</b> {movie.release_date.strftime('%Y-%m-%d')}\n"
+    if movie.vote_average:
+        text += f"⭐ <b>Rating:</b> {movie.vote_average}/10\n"
+    if movie.genres:
+        text += f"🎭 <b>Genres:</b> {html.escape(', '.join(movie.genres))}\n"
+    return text, movie.overview or "", ""
+
+
+def _channel_post_parts(movie: Movie) -> Tuple[str, str, str]:
+    text = f"🎬 <b>{html.escape(movie.title)}</b>\n\n"
+    if movie.release_date:
+        text += f"📅 <b>Release Date:</b> {movie.release_date.strftime('%B %d, %Y')}\n"
+    if movie.vote_average:
+        rating_emoji = "⭐" * max(1, min(5, round(movie.vote_average / 2)))
+        text += f"⭐ <b>Rating:</b> {movie.vote_average}/10 {rating_emoji}\n"
+    if movie.genres:
+        text += f"🎭 <b>Genres:</b> {html.escape(', '.join(movie.genres))}\n"
+
+    footer = ""
+    if movie.popularity:
+        footer += f"\n🔥 <b>Popularity:</b> {movie.popularity:.1f}\n"
+    footer += "\n🎥 <i>Follow this movie to get updates!</i>"
+    return text, movie.overview or "", footer
+
+
+def _watchlist_row_parts(movie: Movie) -> Tuple[str, str, str]:
+    text = f"🎬 <b>{html.escape(movie.title)}</b>"
+    if movie.release_date:
+        text += f" ({movie.release_date.year})"
+    if movie.vote_average:
+        text += f" — ⭐ {movie.vote_average}/10"
+    if movie.genres:
+        text += f"\n🎭 {html.escape(', '.join(movie.genres))}"
+    return text, "", ""
+
+
+# Each template returns (head, raw overview, footer); the overview is the part that gets shortened
+TEMPLATES: Dict[str, Callable[[Movie], Tuple[str, str, str]]] = {
+    USER_CARD: _user_card_parts,
+    CHANNEL_POST: _channel_post_parts,
+    WATCHLIST_ROW: _watchlist_row_parts,
+}
+
+# Overviews are shortened to this many characters even when more would fit
+OVERVIEW_MAX_LENGTH = 300
+
+
+def telegram_length(text: str) -> int:
+    """Length as Telegram counts it: UTF-16 code units, so emoji count as two."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _cut(text: str, units: int) -> str:
+    """Keeps at most `units` UTF-16 code units, never splitting a surrogate pair."""
+    return text.encode("utf-16-le")[:2 * max(0, units)].decode("utf-16-le", errors="ignore")
+
+
+def _fit(head: str, overview: str, footer: str, limit: int) -> str:
+    """Joins the parts, shortening the overview first so HTML tags are never cut."""
+    if len(overview) > OVERVIEW_MAX_LENGTH:
+        overview = overview[:OVERVIEW_MAX_LENGTH - 3] + "..."
+    while True:
+        text = head + (_overview_block(overview) if overview else "") + footer
+        excess = telegram_length(text) - limit
+        if excess <= 0 or not overview:
+            break
+        keep = len(overview) - excess - 3
+        overview = overview[:keep] + "..." if keep > 0 else ""
+    return truncate_html(text, limit)
+
+
+def truncate_html(text: str, limit: int) -> str:
+    """Hard-truncates text to `limit` UTF-16 units, dropping any unterminated tag or entity."""
+    if telegram_length(text) <= limit:
+        return text
+    if limit <= 1:
+        return ""
+    text = _cut(text, limit - 1)
+    # Drop a partially cut tag or entity
+    for opener, closer in (("<", ">"), ("&", ";")):
+        cut = text.rfind(opener)
+        if cut != -1 and text.find(closer, cut) == -1:
+            text = text[:cut]
+    # Strip formatting if a tag pair was cut in half
+    if text.count("<b>") != text.count("</b>") or text.count("<i>") != text.count("</i>"):
+        text = text.replace("<b>", "").replace("</b>", "").replace("<i>", "").replace("</i>", "")
+    return text + "…"
+
+
+def _minimal_caption(movie: Movie, limit: int) -> str:
+    """Title only, for when nothing else fits."""
+    return truncate_html(f"🎬 <b>{html.escape(movie.title)}</b>", limit)
+
+
+def render_movie(movie: Movie, template: str = USER_CARD, limit: int = CAPTION_LIMIT) -> str:
+    """Renders a movie for the given surface, memoized per (movie, updated_at, template)."""
+    if movie.id is None:
+        # Transient movies (e.g. straight from a TMDb search) have no stable cache key
+        return _fit(*TEMPLATES[template](movie), limit)
+
+    key = (movie.id, movie.updated_at, template, limit)
+    cached = _render_cache.get(key)
+    if cached is not None:
+        _render_cache.move_to_end(key)
+        return cached
+
+    head, overview, footer = TEMPLATES[template](movie)
+    text = _fit(head, overview, footer, limit)
+
+    _render_cache[key] = text
+    while len(_render_cache) > RENDER_CACHE_SIZE:
+        _render_cache.popitem(last=False)
+    return text
+
+
+def render_movie_caption(
+    movie: Movie,
+    template: str = USER_CARD,
+    prefix: str = "",
+    suffix: str = "",
+    limit: int = CAPTION_LIMIT,
+) -> str:
+    """
+    Renders a movie with extra (already escaped) text around it, within `limit`.
+    Prefix and suffix are shortened so at least MIN_BODY_LENGTH is left for the movie.
+    """
+    room = max(0, limit - MIN_BODY_LENGTH)
+    # Separators: "\n\n" after the prefix, "\n" before the suffix
+    prefix = truncate_html(prefix, (room // 3 if suffix else room) - 2) if prefix else ""
+    suffix = truncate_html(suffix, room - (telegram_length(prefix) + 2 if prefix else 0) - 1) if suffix else ""
+
+    head = f"{prefix}\n\n" if prefix else ""
+    tail = f"\n{suffix}" if suffix else ""
+    body_limit = limit - telegram_length(head) - telegram_length(tail)
+    if body_limit < MIN_BODY_LENGTH:
+        return _minimal_caption(movie, limit)
+    return head + render_movie(movie, template, body_limit) + tail
+
+
+def watchlist_button(tmdb_id: int, in_watchlist: bool) -> InlineKeyboardButton:
+    """Builds the add/in-watchlist button reflecting the user's own state."""
+    if in_watchlist:
+        return InlineKeyboardButton(text="✅ In Watchlist", callback_data="already_in_watchlist")
+    return InlineKeyboardButton(text="➕ Add to Watchlist", callback_data=f"watchlist_add_{tmdb_id}")
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def movie_keyboard(
+    tmdb_id: int,
+    template: str = USER_CARD,
+    in_watchlist: bool = False,
+    with_credits: bool = False,
+    with_similar: bool = True,
+) -> InlineKeyboardMarkup:
+    """
+    Builds (and memoizes) the inline keyboard shown under a movie. Inline-mode results pass
+    with_similar=False: their callbacks carry no message to answer the list under.
+    """
+    rows: List[List[InlineKeyboardButton]] = []
+    if with_credits:
+        rows.append([InlineKeyboardButton(text="👥 Cast & Crew", callback_data=f"credits_{tmdb_id}")])
+
+    if template == CHANNEL_POST:
+        rows.append([InlineKeyboardButton(text="🔔 Follow Movie", callback_data=f"follow_movie_{tmdb_id}")])
+    elif template == WATCHLIST_ROW:
+        rows.append([InlineKeyboardButton(text="🗑️ Remove from Watchlist", callback_data=f"watchlist_remove_{tmdb_id}")])
+    else:
+        rows.append([watchlist_button(tmdb_id, in_watchlist)])
+        if with_similar:
+            rows.append([InlineKeyboardButton(text="🎞 More like this", callback_data=f"similar_{tmdb_id}")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def similar_movies_message(movies: List[Movie]) -> Tuple[str, InlineKeyboardMarkup]:
+    """Builds the "more like this" list and a button per movie that opens its card."""
+    lines = ["🎞 <b>More like this:</b>\n"]
+    buttons = []
+    for i, movie in enumerate(movies, 1):
+        year = f" ({movie.release_date.year})" if movie.release_date else ""
+        rating = f" ⭐ {movie.vote_average:.1f}" if movie.vote_average else ""
+        lines.append(f"{i}. {html.escape(movie.title)}{year}{rating}")
+        buttons.append([InlineKeyboardButton(text=f"🎬 {movie.title}{year}"[:64], callback_data=f"movie_card_{movie.tmdb_id}")])
+    return "\n".join(lines), InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -0,0 +1,253 @@
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from logger import get_logger
+
+logger = get_logger()
+
+# HTTP status codes that indicate a transient upstream problem
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+
+class TransientError(Exception):
+    """Raised by callers for upstream responses that are worth retrying (e.g. HTTP 503)."""
+
+
+class EndpointPolicy:
+    """Deadline, retry, breaker and hedging settings for one upstream endpoint."""
+
+    def __init__(
+        self,
+        timeout: float,
+        retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        hedge_after: Optional[float] = None,
+        min_rate: Optional[float] = None,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # Only set for idempotent reads: start a second request if the first is this slow
+        self.hedge_after = hedge_after
+        # For transfers: slowest acceptable bytes/second, extending the deadline with the expected size
+        self.min_rate = min_rate
+
+    def deadline(self, expected_bytes: Optional[int] = None) -> float:
+        if self.min_rate and expected_bytes:
+            return self.timeout + expected_bytes / self.min_rate
+        return self.timeout
+
+
+ENDPOINTS: Dict[str, EndpointPolicy] = {
+    "tmdb": EndpointPolicy(timeout=10, retries=2, hedge_after=1.5),
+    "fastsaver": EndpointPolicy(timeout=20, retries=2),
+    "cdn": EndpointPolicy(timeout=60, retries=1, base_delay=1.0, min_rate=1024 * 1024),
+    "gemini_generate": EndpointPolicy(timeout=180, retries=1, base_delay=2.0),
+    "gemini_files": EndpointPolicy(timeout=120, retries=1, base_delay=2.0, min_rate=1024 * 1024),
+}
+
+
+# Deadline and policy of the attempt running in this context, so a transfer can rescale it
+_attempt: ContextVar[Optional[Tuple[asyncio.Timeout, EndpointPolicy]]] = ContextVar("resilience_attempt", default=None)
+
+
+def scale_deadline(expected_bytes: int):
+    """
+    Restarts the current attempt's deadline for a transfer of `expected_bytes`, e.g. once
+    a response's Content-Length is known. Does nothing outside call_with_resilience().
+    """
+    attempt = _attempt.get()
+    if attempt is not None:
+        deadline, policy = attempt
+        deadline.reschedule(asyncio.get_running_loop().time() + policy.deadline(expected_bytes))
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker counting consecutive transient failures.
+    While half-open, a single trial call is let through; everyone else is rejected until it settles.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            logger.info(f"Circuit breaker '{self.name}' half-open, probing upstream")
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        if self.state != "closed":
+            self.rejected += 1
+            return False
+        return True
+
+    def abandon_probe(self):
+        """Frees the half-open trial slot when the trial call ended without a verdict (e.g. cancelled)."""
+        self.probing = False
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"Circuit breaker '{self.name}' closed")
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"Circuit breaker '{self.name}' opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        policy = ENDPOINTS[endpoint]
+        breaker = CircuitBreaker(endpoint, policy.failure_threshold, policy.reset_timeout)
+        _breakers[endpoint] = breaker
+    return breaker
+
+
+def get_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Returns the state and counters of every circuit breaker."""
+    return {
+        name: {
+            "state": b.state,
+            "failures": b.failures,
+            "times_opened": b.times_opened,
+            "rejected": b.rejected,
+        }
+        for name, b in _breakers.items()
+    }
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Decides whether an error is a transient upstream failure."""
+    if isinstance(exc, (asyncio.TimeoutError, TransientError)):
+        return True
+    # aiohttp (status), requests (response.status_code) and google-api-core (code) errors
+    status = getattr(exc, "status", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = getattr(exc.response, "status_code", None)
+    if status is None and isinstance(getattr(exc, "code", None), int):
+        status = exc.code
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return isinstance(exc, (ConnectionError, OSError)) or type(exc).__module__.startswith("aiohttp")
+
+
+async def _hedged(func: Callable[[], Awaitable[Any]], hedge_after: float) -> Any:
+    """Runs func, starting a second copy if the first has not finished after `hedge_after` seconds."""
+    first = asyncio.ensure_future(func())
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+
+    second = asyncio.ensure_future(func())
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_resilience(
+    endpoint: str,
+    func: Callable[[], Awaitable[Any]],
+    idempotent: bool = False,
+    expected_bytes: Optional[int] = None,
+) -> Any:
+    """
+    Calls `func` under the endpoint's policy: per-attempt deadline (scaled by `expected_bytes`
+    for transfers, or by `func` itself through scale_deadline()) and a circuit breaker. Only idempotent calls are retried, with exponential
+    backoff and full jitter, and hedged: a timed-out attempt may still complete in the background
+    (threads cannot be cancelled), so repeating a call with side effects could apply them twice.
+    """
+    policy = ENDPOINTS[endpoint]
+    breaker = get_breaker(endpoint)
+    retries = policy.retries if idempotent else 0
+    timeout = policy.deadline(expected_bytes)
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"Upstream '{endpoint}' is unavailable (circuit open)")
+
+        try:
+            async with asyncio.timeout(timeout) as deadline:
+                token = _attempt.set((deadline, policy))
+                try:
+                    if idempotent and policy.hedge_after:
+                        result = await _hedged(func, policy.hedge_after)
+                    else:
+                        result = await func()
+                finally:
+                    _attempt.reset(token)
+        except Exception as e:
+            if not is_retryable(e):
+                # The upstream answered; the error is about this request, not the upstream's health
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt >= retries:
+                raise
+            delay = random.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** attempt))
+            logger.warning(f"{endpoint} call failed ({type(e).__name__}: {e}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        except BaseException:
+            breaker.abandon_probe()
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+
+async def call_blocking(
+    endpoint: str,
+    func: Callable[..., Any],
+    *args,
+    idempotent: bool = False,
+    expected_bytes: Optional[int] = None,
+    **kwargs,
+) -> Any:
+    """Runs a blocking client call (tmdbsimple, genai file API) in a thread under the endpoint's policy."""
+    return await call_with_resilience(
+        endpoint, lambda: asyncio.to_thread(func, *args, **kwargs),
+        idempotent=idempotent, expected_bytes=expected_bytes,
+    )
@@ -0,0 +1,254 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select, delete, func, or_
+from sqlalchemy.dialects.postgresql import insert
+from models import get_session
+from models.movie import Movie
+from models.movie_cast import MovieCast
+from models.movie_crew import MovieCrew
+from models.movie_similarity import MovieSimilarity, MovieSimilarityState
+from config import SIMILAR_TOP_K, SIMILAR_BATCH_SIZE
+from logger import get_logger
+
+logger = get_logger()
+
+# Weight of a crew credit by department; other departments get DEFAULT_CREW_WEIGHT
+CREW_WEIGHTS = {
+    "Directing": 3.0,
+    "Writing": 2.0,
+    "Camera": 1.0,
+    "Editing": 1.0,
+    "Sound": 0.8,
+    "Production": 0.5,
+}
+DEFAULT_CREW_WEIGHT = 0.3
+GENRE_WEIGHT = 1.5
+# Actors billed below this carry little signal and are ignored
+MAX_CAST_ORDER = 20
+# Rows fetched per round trip while streaming features
+STREAM_BATCH_SIZE = 10000
+
+
+def _cast_weight(order: Optional[int]) -> float:
+    """Top-billed actors weigh the most; weight decays with billing order."""
+    return 2.0 / (1.0 + 0.25 * (MAX_CAST_ORDER if order is None else order))
+
+
+def _build_matrix(
+    movies: List[Tuple[int, Optional[List[str]], bool]],
+    credits: Tuple[np.ndarray, np.ndarray, np.ndarray],
+) -> Tuple[np.ndarray, sparse.csr_matrix]:
+    """
+    Builds the L2-normalized movie x feature matrix. Features are genres and people;
+    a person credited several times on one movie (e.g. writer-director) adds up.
+    Features are IDF-weighted so that ubiquitous ones ("Drama") matter less.
+    """
+    movie_ids = np.array([movie[0] for movie in movies], dtype=np.int64)
+    genre_columns: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    for row, (_, genres, _) in enumerate(movies):
+        for genre in genres or []:
+            rows.append(row)
+            cols.append(genre_columns.setdefault(genre, len(genre_columns)))
+
+    credit_movies, credit_people, credit_weights = credits
+    if len(movie_ids) and len(credit_movies):
+        sorter = np.argsort(movie_ids)
+        positions = sorter[np.minimum(np.searchsorted(movie_ids, credit_movies, sorter=sorter), len(movie_ids) - 1)]
+        known = movie_ids[positions] == credit_movies
+        credit_rows = positions[known]
+        people, person_columns = np.unique(credit_people[known], return_inverse=True)
+        credit_weights = credit_weights[known]
+    else:
+        credit_rows = person_columns = np.zeros(0, dtype=np.int64)
+        people, credit_weights = [], np.zeros(0, dtype=np.float32)
+
+    matrix = sparse.csr_matrix(
+        (
+            np.concatenate([np.full(len(rows), GENRE_WEIGHT, dtype=np.float32), credit_weights]),
+            (
+                np.concatenate([np.array(rows, dtype=np.int64), credit_rows]),
+                np.concatenate([np.array(cols, dtype=np.int64), person_columns + len(genre_columns)]),
+            ),
+        ),
+        shape=(len(movie_ids), max(len(genre_columns) + len(people), 1)),
+    )
+    matrix.sum_duplicates()
+
+    document_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = (np.log((1 + matrix.shape[0]) / (1 + document_frequency)) + 1).astype(np.float32)
+    matrix = matrix @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    matrix = sparse.diags(inverse.astype(np.float32)) @ matrix
+    return movie_ids, matrix.tocsr()
+
+
+def _top_neighbors(
+    matrix: sparse.csr_matrix, movie_ids: np.ndarray, rows: List[int], top_k: int
+) -> Dict[int, List[Tuple[int, float]]]:
+    """Cosine top-k neighbours of the given rows as movie_id -> [(similar movie id, score)]."""
+    scores = (matrix[rows] @ matrix.T).tocsr()
+    neighbors = {}
+    for i, row in enumerate(rows):
+        start, end = scores.indptr[i], scores.indptr[i + 1]
+        columns = scores.indices[start:end]
+        values = scores.data[start:end]
+        keep = (columns != row) & (values > 0)
+        columns, values = columns[keep], values[keep]
+        if len(values) > top_k:
+            best = np.argpartition(-values, top_k)[:top_k]
+            columns, values = columns[best], values[best]
+        order = np.argsort(-values, kind="stable")
+        neighbors[int(movie_ids[row])] = [
+            (int(movie_ids[column]), float(value)) for column, value in zip(columns[order], values[order])
+        ]
+    return neighbors
+
+
+def _affected_rows(
+    matrix: sparse.csr_matrix, new_rows: List[int], thresholds: np.ndarray, batch_size: int
+) -> Set[int]:
+    """Rows whose stored top-k would be entered by one of the new movies."""
+    affected: Set[int] = set()
+    for start in range(0, len(new_rows), batch_size):
+        scores = matrix[new_rows[start:start + batch_size]] @ matrix.T
+        best = scores.max(axis=0).toarray().ravel()
+        affected.update(np.nonzero(best > thresholds)[0].tolist())
+    return affected
+
+
+async def _stream(session, statement):
+    """Yields result rows in chunks of STREAM_BATCH_SIZE from a server-side cursor."""
+    result = await session.stream(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+    async for rows in result.partitions():
+        yield rows
+
+
+async def _load_credits(session, statement, weight) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Streams (movie_id, person_id, x) rows into compact arrays, with x mapped to a feature weight."""
+    movie_ids, person_ids, weights = [], [], []
+    async for rows in _stream(session, statement):
+        movie_ids.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+        person_ids.append(np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows)))
+        weights.append(np.fromiter((weight(row[2]) for row in rows), dtype=np.float32, count=len(rows)))
+    return (
+        np.concatenate(movie_ids or [np.zeros(0, dtype=np.int64)]),
+        np.concatenate(person_ids or [np.zeros(0, dtype=np.int64)]),
+        np.concatenate(weights or [np.zeros(0, dtype=np.float32)]),
+    )
+
+
+async def _load_features(session):
+    """Streams movies as (id, genres, needs_refresh) and all credits as person feature arrays."""
+    needs_refresh = or_(
+        MovieSimilarityState.computed_at.is_(None),
+        # enriched_at only moves when genres or credits are (re)fetched; updated_at also
+        # moves on every import's popularity refresh
+        Movie.enriched_at > MovieSimilarityState.computed_at,
+    )
+    movies = []
+    async for rows in _stream(
+        session,
+        select(Movie.id, Movie.genres, needs_refresh)
+        .outerjoin(MovieSimilarityState, MovieSimilarityState.movie_id == Movie.id),
+    ):
+        movies.extend((movie_id, genres, bool(refresh)) for movie_id, genres, refresh in rows)
+    cast = await _load_credits(
+        session,
+        select(MovieCast.movie_id, MovieCast.person_id, MovieCast.cast_order)
+        .where(or_(MovieCast.cast_order.is_(None), MovieCast.cast_order < MAX_CAST_ORDER)),
+        _cast_weight,
+    )
+    crew = await _load_credits(
+        session,
+        select(MovieCrew.movie_id, MovieCrew.person_id, MovieCrew.department),
+        lambda department: CREW_WEIGHTS.get(department, DEFAULT_CREW_WEIGHT),
+    )
+    credits = tuple(np.concatenate([c, d]) for c, d in zip(cast, crew))
+    return movies, credits
+
+
+async def _save_neighbors(neighbors: Dict[int, List[Tuple[int, float]]], computed_at: datetime):
+    """Replaces the stored neighbour lists of the given movies and marks them as computed."""
+    async with get_session() as session:
+        await session.execute(delete(MovieSimilarity).where(MovieSimilarity.movie_id.in_(list(neighbors))))
+        values = [
+            {"movie_id": movie_id, "similar_movie_id": similar_id, "rank": rank, "score": score}
+            for movie_id, similar in neighbors.items()
+            for rank, (similar_id, score) in enumerate(similar)
+        ]
+        if values:
+            await session.execute(insert(MovieSimilarity).values(values))
+        state = insert(MovieSimilarityState).values(
+            [{"movie_id": movie_id, "computed_at": computed_at} for movie_id in neighbors]
+        )
+        await session.execute(
+            state.on_conflict_do_update(index_elements=["movie_id"], set_={"computed_at": state.excluded.computed_at})
+        )
+        await session.commit()
+
+
+async def refresh_similarity_index(full: bool = False, top_k: int = SIMILAR_TOP_K, batch_size: int = SIMILAR_BATCH_SIZE) -> int:
+    """
+    Recomputes stored neighbour lists and returns how many movies were updated.
+
+    Incremental by default: only movies that are new or re-enriched since their last computation,
+    plus existing movies whose top-k one of them now enters, are recomputed. IDF weights drift
+    slightly as the catalogue grows, so run a full rebuild now and then.
+    """
+    full_lists: Dict[int, float] = {}
+    async with get_session() as session:
+        # Same clock as movies.enriched_at; movies enriched while this run computes are picked up next time
+        started_at = datetime.now()
+        movies, credits = await _load_features(session)
+        if not full:
+            async for rows in _stream(
+                session,
+                select(MovieSimilarity.movie_id, func.min(MovieSimilarity.score), func.count())
+                .group_by(MovieSimilarity.movie_id),
+            ):
+                full_lists.update((movie_id, score) for movie_id, score, count in rows if count >= top_k)
+
+    movie_ids, matrix = await asyncio.to_thread(_build_matrix, movies, credits)
+    has_features = np.diff(matrix.indptr) > 0
+
+    if full:
+        targets = np.nonzero(has_features)[0].tolist()
+    else:
+        new_rows = [i for i, (_, _, refresh) in enumerate(movies) if refresh and has_features[i]]
+        if not new_rows:
+            return 0
+        # A movie with a full list is only affected if a new movie beats its current k-th neighbour
+        thresholds = np.zeros(len(movie_ids), dtype=np.float32)
+        row_of = {movie_id: i for i, movie_id in enumerate(movie_ids.tolist())}
+        for movie_id, score in full_lists.items():
+            if movie_id in row_of:
+                thresholds[row_of[movie_id]] = score
+        affected = await asyncio.to_thread(_affected_rows, matrix, new_rows, thresholds, batch_size)
+        targets = sorted((set(new_rows) | affected) & set(np.nonzero(has_features)[0].tolist()))
+
+    for start in range(0, len(targets), batch_size):
+        neighbors = await asyncio.to_thread(_top_neighbors, matrix, movie_ids, targets[start:start + batch_size], top_k)
+        await _save_neighbors(neighbors, started_at)
+
+    logger.info(f"✅ Similarity index updated for {len(targets)} movies ({'full' if full else 'incremental'})")
+    return len(targets)
+
+
+async def get_similar_movies(session, tmdb_id: int, limit: int = SIMILAR_TOP_K) -> List[Movie]:
+    """Returns the precomputed neighbours of a movie, closest first, in a single query."""
+    source_id = select(Movie.id).where(Movie.tmdb_id == tmdb_id).scalar_subquery()
+    result = await session.execute(
+        select(Movie)
+        .join(MovieSimilarity, MovieSimilarity.similar_movie_id == Movie.id)
+        .where(MovieSimilarity.movie_id == source_id)
+        .order_by(MovieSimilarity.rank)
+        .limit(limit)
+    )
+    return result.scalars().all()
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from logger import get_logger
+
+logger = get_logger()
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+    Callers that arrive while a call is in flight await the same task and get its result.
+    The shared task is cancelled only when every caller waiting on it has been cancelled.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    def is_running(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+            self._waiters.pop(key, None)
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            logger.info(f"Joining in-flight call for {key}")
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # Shield so one caller being cancelled does not cancel the shared work
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._in_flight.get(key) is task and self._waiters.get(key, 0) <= 1:
+                task.cancel()
+            raise
+        finally:
+            if self._in_flight.get(key) is task:
+                self._waiters[key] -= 1
+
+
+single_flight = SingleFlight()
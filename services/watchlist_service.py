@@ -0,0 +1,58 @@
+from typing import List
+from sqlalchemy import select, delete, exists
+from sqlalchemy.dialects.postgresql import insert
+from models.movie import Movie
+from models.user_watchlist import UserWatchlist
+
+
+async def add_to_watchlist(session, user_id: int, tmdb_id: int) -> bool:
+    """Adds a movie to a user's watchlist. Returns False if the movie is unknown."""
+    movie_id = await session.scalar(select(Movie.id).where(Movie.tmdb_id == tmdb_id))
+    if movie_id is None:
+        return False
+
+    await session.execute(
+        insert(UserWatchlist)
+        .values(user_id=user_id, movie_id=movie_id)
+        .on_conflict_do_nothing(index_elements=["user_id", "movie_id"])
+    )
+    await session.commit()
+    return True
+
+
+async def remove_from_watchlist(session, user_id: int, tmdb_id: int):
+    """Removes a movie from a user's watchlist."""
+    await session.execute(
+        delete(UserWatchlist).where(
+            UserWatchlist.user_id == user_id,
+            UserWatchlist.movie_id == select(Movie.id).where(Movie.tmdb_id == tmdb_id).scalar_subquery(),
+        )
+    )
+    await session.commit()
+
+
+async def is_in_watchlist(session, user_id: int, tmdb_id: int) -> bool:
+    """Checks membership with a single primary key probe."""
+    return await session.scalar(
+        select(exists().where(
+            UserWatchlist.user_id == user_id,
+            UserWatchlist.movie_id == Movie.id,
+            Movie.tmdb_id == tmdb_id,
+        ))
+    )
+
+
+async def get_watchlist(session, user_id: int, limit: int | None = None, offset: int = 0) -> List[Movie]:
+    """Returns the user's watchlist, newest first."""
+    query = (
+        select(Movie)
+        .join(UserWatchlist, UserWatchlist.movie_id == Movie.id)
+        .where(UserWatchlist.user_id == user_id)
+        .order_by(UserWatchlist.added_at.desc())
+        .offset(offset)
+    )
+    if limit:
+        query = query.limit(limit)
+    result = await session.execute(query)
+    return result.scalars().all()
+